@@ -10,12 +10,14 @@
 # modified: 2020-04-09
 #
 
-import logging, threading
+import os, threading, hashlib, orjson
 from colorama import init, Fore, Style
 init()
 
-from flask import Flask, jsonify, request, render_template, send_from_directory
+from gevent import pywsgi, get_hub
+from flask import Flask, Response, current_app, request, render_template
 from flask_restful import Api
+from whitenoise import WhiteNoise
 #from flask_socketio import SocketIO, emit
 
 from lib.logger import Level, Logger
@@ -26,21 +28,48 @@ from lib.event import Event
 app = Flask(__name__)
 api = Api(app)
 #socketio = SocketIO(app)
+_log = Logger('flask.wrapper', Level.INFO)
+
+# log formats, with their colors resolved once at load
+_SPEED_FORMAT    = Fore.GREEN + 'setSpeed: port: %5.2f, starboard: %5.2f'
+_ACTION_FORMAT   = Fore.MAGENTA + Style.BRIGHT + 'ACTION: %s'
+_RESPONSE_FORMAT = Fore.MAGENTA + Style.BRIGHT + 'RESPONSE mimetype: %s; body: %s'
+
+# static assets are served by WhiteNoise rather than flask routes: the files
+# are indexed once at startup and sent with a one week public max-age.
+_root = os.path.dirname(os.path.abspath(__file__))
+app.wsgi_app = WhiteNoise(app.wsgi_app, max_age=604800)
+for _dir in [ 'style', 'script', 'apidocs' ]:
+    if os.path.isdir(os.path.join(_root, _dir)): # apidocs is optional
+        app.wsgi_app.add_files(os.path.join(_root, _dir), prefix=_dir + '/')
+
+# the index page has no per-request content so it's rendered only once
+with app.app_context():
+    _index_html = render_template('index.html')
+_index_etag = hashlib.sha1(_index_html.encode('utf-8')).hexdigest()
+
+def _json(obj):
+    '''
+        Returns the object serialised by orjson as a JSON response.
+    '''
+    return Response(orjson.dumps(obj), mimetype='application/json')
 
 # endpoints ...............................................
 
 @app.route('/')
 def home():
-    return render_template('index.html')  # render a template
+    _response = Response(_index_html, mimetype='text/html')
+    _response.set_etag(_index_etag)
+    return _response.make_conditional(request) # 304 if the ETag matches
 
 @app.route('/cancel')
 def cancel():
-    global loop
-    if ( loop is True ):
-        loop = False
-        return jsonify(state='loop cancelled.')
-    else:
-        return jsonify(state='no active loop.')
+    _config = current_app.config
+    with _config['LOOP_LOCK']:
+        if _config['LOOP']:
+            _config['LOOP'] = False
+            return _json({ 'state': 'loop cancelled.' })
+    return _json({ 'state': 'no active loop.' })
 
 @app.route('/speed')
 def setSpeed():
@@ -48,76 +77,80 @@ def setSpeed():
     starboard  = request.args.get('starboard', type=int)
     port_speed = float( port )
     starboard_speed = float( starboard )
-    print(Fore.GREEN + 'setSpeed: port: {:>5.2f}, starboard: {:>5.2f}'.format(port_speed, starboard_speed) + Style.RESET_ALL)
-    return jsonify([ { 'port_speed': port_speed }, { 'starboard_speed': starboard_speed } ])
+    _log.debug(_SPEED_FORMAT, port_speed, starboard_speed)
+    return _json({ 'port_speed': port_speed, 'starboard_speed': starboard_speed })
 
 @app.route('/event')
 def setEvent():
-    global g_controller, g_queue
     event_label = request.args.get('id', type=str)
     event = Event.from_str(event_label)
-    print( Fore.MAGENTA + Style.BRIGHT + 'ACTION: {}'.format(event.name) + Style.RESET_ALL)
-    response = g_queue.respond(event)
-    print( Fore.MAGENTA + Style.BRIGHT + 'RESPONSE mimetype: {}; json: {}'.format(response.mimetype, response.json) + Style.RESET_ALL)
+    _log.debug(_ACTION_FORMAT, event.name)
+    response = current_app.config['QUEUE'].respond(event)
+    if _log.is_enabled_for(Level.DEBUG): # avoid re-parsing the response body
+        _log.debug(_RESPONSE_FORMAT, response.mimetype, response.get_data(as_text=True))
     return response
 #   return jsonify([ event_label ])
 
-@app.route('/style/<path:path>')
-def send_style(path):
-    return send_from_directory('style', path)
-
-@app.route('/script/<path:path>')
-def send_script(path):
-    return send_from_directory('script', path)
-
 #@app.route('/doc')
 #def doc_home():
 #    return render_template('apidocs/index.html')  # render a template
 
-@app.route('/apidocs/<path:path>')
-def send_api_docs(path):
-    return send_from_directory('apidocs', path)
-
-# see: https://stackoverflow.com/questions/31264826/start-a-flask-application-in-separate-thread
-def shutdown_server(environ):
-    if not 'werkzeug.server.shutdown' in environ:
-        raise RuntimeError('Not running the development server')
-    environ['werkzeug.server.shutdown']()
+class FlaskWrapperService(threading.Thread):
+    '''
+        Runs the RESTful flask service on port 8085 as a thread of the ROS.
 
+        Requests are handled by greenlets drawn from a bounded pool and HTTP
+        1.1 connections are kept alive between requests, so clients polling
+        the robot don't pay for a new TCP connection on each request. This
+        can't be deployed as separate gunicorn worker processes as the
+        endpoints talk directly to the in-process message queue.
+    '''
 
-class FlaskWrapperService(threading.Thread):
+    MAX_CONNECTIONS = 1000
 
     def __init__(self, queue, controller):
-        global g_queue, g_controller
-        super().__init__()
-        g_queue = queue
-        g_controller = controller
-        threading.Thread.__init__(self)
-        self._thread = None
+        # a daemon so that an unclosed service never holds up ROS exit
+        super().__init__(name='flask', daemon=True)
+        # service state is held by the app rather than as module globals
+        app.config['QUEUE']      = queue
+        app.config['CONTROLLER'] = controller
+        app.config['LOOP_LOCK']  = threading.Lock()
+        app.config['LOOP']       = False
+        self._server = None
+        self._hub    = None
         self._log = Logger('flask.wrapper', Level.INFO)
         self._log.debug('ready')
 
     # ..........................................................................
     def run(self):
-        global app
+        '''
+            Serves the flask app from a gevent WSGIServer on this thread.
+
+            The server runs on this thread's own gevent hub, so there's no
+            need to monkey-patch the rest of the ROS process (which relies
+            upon real threads for its sensors and motor control).
+        '''
         self._log.info('starting flask wrapper...')
-        # suppress console log messages (this doesn't actually work)
-        _flask_log = logging.getLogger('werkzeug')
-        _flask_log.setLevel(logging.ERROR)
-        _flask_log.disabled = True
 #       socketio.run(app)
-        self._thread = threading.Thread(target=app.run(host='0.0.0.0', port=8085, debug=False, use_reloader=False))
-        self._thread.start()
-#       app.run(host='0.0.0.0', port=8085, debug=False, use_reloader=False)
+        self._hub = get_hub()
+        # log=None suppresses the per-request access log
+        self._server = pywsgi.WSGIServer(('0.0.0.0', 8085), app, log=None, spawn=FlaskWrapperService.MAX_CONNECTIONS)
+        self._server.serve_forever(stop_timeout=1.0)
         self._log.info('ended flask thread.')
 
 
     # ..........................................................................
     def close(self):
+        '''
+            Stops the WSGIServer. The server belongs to the hub of the
+            service thread so we ask that hub to close it, then wait for
+            serve_forever() to return.
+        '''
         self._log.info('closing flask.')
-        if self._thread != None:
-            self._thread.join(timeout=1.0)
-            self._log.info('flask app thread joined.')
+        if self._server is not None:
+            self._hub.loop.run_callback_threadsafe(self._server.close)
+            self.join(timeout=2.0)
+            self._log.info('flask service thread joined.')
         self._log.info('closed flask.')
 
 
@@ -18,7 +18,7 @@
 #   % sudo pip3 install pigpio
 #
 
-import time, itertools, traceback
+import signal, threading, itertools, traceback
 from colorama import init, Fore, Style
 init()
 
@@ -33,6 +33,7 @@ from lib.indicator import Indicator
 # ..............................................................................
 
 _ifs = None
+_stop = threading.Event()
 
 def main():
 
@@ -54,8 +55,9 @@ def main():
 
         _ifs.enable()
 
-        while True:
-            time.sleep(1.0)
+        # block until Ctrl-C or SIGTERM rather than waking periodically
+        signal.signal(signal.SIGTERM, lambda signum, frame: _stop.set())
+        _stop.wait()
 
     except KeyboardInterrupt:
         print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 by Murray Altheim. All rights reserved. This file is part of
+# the Robot OS project and is released under the "Apache Licence, Version 2.0".
+# Please see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2020-10-15
+#
+#  Initialises colorama once for the process, so that modules may simply
+#  import Fore and Style from here rather than each calling init() on import.
+#
+
+from colorama import init, Fore, Style
+init()
+
+#EOF
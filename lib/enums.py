@@ -12,6 +12,9 @@
 # modified: 2020-03-26
 
 from enum import Enum
+from collections import namedtuple
+
+from lib.jit import njit
 
 # ..............................................................................
 class Orientation(Enum):
@@ -43,6 +46,10 @@ class Direction(Enum):
     REVERSE = 1
 
 
+# ..............................................................................
+# a plain (slotted) red, green, blue triple, cheaper to read than Color properties
+RGB = namedtuple('RGB', 'red green blue')
+
 # ..............................................................................
 class Color(Enum):
     WHITE          = (  1, 255.0, 255.0, 255.0)
@@ -78,6 +85,9 @@ class Color(Enum):
         self._red = red
         self._green = green
         self._blue = blue
+        # precomputed for pixel and LED consumers
+        self._rgb = RGB(int(red), int(green), int(blue))
+        self._unit_rgb = ( red / 255.0, green / 255.0, blue / 255.0 )
 
     @property
     def red(self):
@@ -91,6 +101,22 @@ class Color(Enum):
     def blue(self):
         return self._blue
 
+    @property
+    def rgb(self):
+        '''
+            Returns the color as an RGB tuple of integer (0-255) red, green
+            and blue values, e.g., for set_pixel(x, y, *color.rgb).
+        '''
+        return self._rgb
+
+    @property
+    def unit_rgb(self):
+        '''
+            Returns the color as a tuple of red, green and blue values
+            scaled to 0.0-1.0, as used by the ThunderBorg LEDs.
+        '''
+        return self._unit_rgb
+
 # ..............................................................................
 class Rotation(Enum):
     COUNTER_CLOCKWISE = 0
@@ -165,22 +191,23 @@ class Heading(Enum):
         '''
             Provided a heading in degrees return an enumerated cardinal direction.
         '''
-        if degrees > 337.25 or degrees < 22.5:
-            return Heading.NORTH
-        elif 292.5 <= degrees <= 337.25:
-            return Heading.NORTHWEST
-        elif 247.5 <- degrees <= 292.5:
-            return Heading.WEST
-        elif 202.5 <= degrees <= 247.5:
-            return Heading.SOUTHWEST
-        elif 157.5 <= degrees <= 202.5:
-            return Heading.SOUTH
-        elif 112.5 <= degrees <= 157.5:
-            return Heading.SOUTHEAST
-        elif 67.5 <= degrees <= 112.5:
-            return Heading.EAST
-        elif 0 <= degrees <= 67.5:
-            return Heading.NORTHEAST
+        return _HEADINGS[heading_index(degrees)]
+
+
+# ..............................................................................
+@njit(cache=True)
+def heading_index(degrees):
+    '''
+        Returns the index (0-7, clockwise from north) of the 45° sector
+        centered on the heading in degrees. This is compiled by numba if
+        available so that it may also be called from other compiled code.
+    '''
+    return int((degrees + 22.5) // 45) & 7
+
+
+# Headings indexed by 45° sector, clockwise from north
+_HEADINGS = [ Heading.NORTH, Heading.NORTHEAST, Heading.EAST, Heading.SOUTHEAST,
+              Heading.SOUTH, Heading.SOUTHWEST, Heading.WEST, Heading.NORTHWEST ]
 
 
 # ..............................................................................
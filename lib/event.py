@@ -132,112 +132,17 @@ class Event(Enum):
 
     @staticmethod
     def from_str(label):
-        # system events ....................
-        if label.upper() == 'BATTERY_LOW': 
-            return Event.BATTERY_LOW
-        elif label.upper() == 'SHUTDOWN': 
-            return Event.SHUTDOWN
-        # stopping and halting .............
-        elif label.upper() == 'STOP': 
-            return Event.STOP
-        elif label.upper() == 'HALT': 
-            return Event.HALT
-        elif label.upper() == 'BRAKE': 
-            return Event.BRAKE
-        elif label.upper() == 'BUTTON': 
-            return Event.BUTTON
-        elif label.upper() == 'STANDBY': 
-            return Event.STANDBY
-        # bumper ...........................
-        elif label.upper() == 'BUMPER_PORT': 
-            return Event.BUMPER_PORT
-        elif label.upper() == 'BUMPER_CNTR': 
-            return Event.BUMPER_CNTR
-        elif label.upper() == 'BUMPER_STBD': 
-            return Event.BUMPER_STBD
-        # infrared .........................
-        elif label.upper() == 'INFRARED_PORT': 
-            return Event.INFRARED_PORT
-        elif label.upper() == 'INFRARED_CNTR': 
-            return Event.INFRARED_CNTR
-        elif label.upper() == 'INFRARED_STBD': 
-            return Event.INFRARED_STBD
-        elif label.upper() == 'INFRARED_PORT_SIDE': 
-            return Event.INFRARED_PORT_SIDE
-        elif label.upper() == 'INFRARED_STBD_SIDE': 
-            return Event.INFRARED_STBD_SIDE
-        # emergency movements ..............
-        elif label.upper() == 'EMERGENCY_ASTERN': 
-            return Event.EMERGENCY_ASTERN
-        # movement ahead ...................
-        elif label.upper() == 'FULL_AHEAD': 
-            return Event.FULL_AHEAD
-        elif label.upper() == 'HALF_AHEAD': 
-            return Event.HALF_AHEAD
-        elif label.upper() == 'SLOW_AHEAD': 
-            return Event.SLOW_AHEAD
-        elif label.upper() == 'DEAD_SLOW_AHEAD': 
-            return Event.DEAD_SLOW_AHEAD
-        elif label.upper() == 'AHEAD': 
-            return Event.AHEAD
-        # movement astern ..................
-        elif label.upper() == 'ASTERN': 
-            return Event.ASTERN
-        elif label.upper() == 'DEAD_SLOW_ASTERN': 
-            return Event.DEAD_SLOW_ASTERN
-        elif label.upper() == 'SLOW_ASTERN': 
-            return Event.SLOW_ASTERN
-        elif label.upper() == 'HALF_ASTERN': 
-            return Event.HALF_ASTERN
-        elif label.upper() == 'FULL_ASTERN': 
-            return Event.FULL_ASTERN
-        # relative change ..................
-        elif label.upper() == 'INCREASE_SPEED': 
-            return Event.INCREASE_SPEED
-        elif label.upper() == 'EVEN': 
-            return Event.EVEN
-        elif label.upper() == 'DECREASE_SPEED': 
-            return Event.DECREASE_SPEED
-        # port turns .......................
-        elif label.upper() == 'TURN_AHEAD_PORT': 
-            return Event.TURN_AHEAD_PORT
-        elif label.upper() == 'TURN_TO_PORT': 
-            return Event.TURN_TO_PORT
-        elif label.upper() == 'TURN_ASTERN_PORT': 
-            return Event.TURN_ASTERN_PORT
-        elif label.upper() == 'SPIN_PORT': 
-            return Event.SPIN_PORT
-        # starboard turns ..................
-        elif label.upper() == 'SPIN_STBD': 
-            return Event.SPIN_STBD
-        elif label.upper() == 'TURN_ASTERN_STBD': 
-            return Event.TURN_ASTERN_STBD
-        elif label.upper() == 'TURN_TO_STBD': 
-            return Event.TURN_TO_STBD
-        elif label.upper() == 'TURN_AHEAD_STBD': 
-            return Event.TURN_AHEAD_STBD
-        # high level behaviours ............
-        elif label.upper() == 'ROAM': 
-            return Event.ROAM
-        elif label.upper() == 'FORWARD_VELOCITY':     
-            return Event.FORWARD_VELOCITY
-        elif label.upper() == 'THETA':               
-            return Event.THETA
-        elif label.upper() == 'PORT_VELOCITY':      
-            return Event.PORT_VELOCITY
-        elif label.upper() == 'PORT_THETA':        
-            return Event.PORT_THETA
-        elif label.upper() == 'STBD_VELOCITY':   
-            return Event.STBD_VELOCITY
-        elif label.upper() == 'STBD_THETA':      
-            return Event.STBD_THETA
-        elif label.upper() == 'SNIFF':      
-            return Event.SNIFF
-
-        elif label.upper() == 'NO_ACTION':      
-            return Event.NO_ACTION
-        else:
+        '''
+            Returns the Event whose name matches the label (ignoring case),
+            raising NotImplementedError if there is no such Event.
+        '''
+        _event = _EVENTS_BY_NAME.get(label.upper())
+        if _event is None:
             raise NotImplementedError
+        return _event
 
 
+# lookup table for Event.from_str(), including aliased names
+_EVENTS_BY_NAME = dict(Event.__members__)
+
 #EOF
@@ -133,10 +133,13 @@ class FileWriter():
             with _file as output_file:
                 while f_is_enabled():
                     while len(queue) > 0:
-                        _data = queue.pop()
+                        _data = queue.popleft()
                         _file.write(_data)
                         self._log.debug('wrote row {}'.format(_data))
                     time.sleep(0.01)
+                # write anything queued just before we were disabled
+                while len(queue) > 0:
+                    _file.write(queue.popleft())
             self._log.info('exited file write loop.')
         finally:
             if _file:
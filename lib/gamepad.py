@@ -14,7 +14,9 @@
 # bottom of this file.
 #
 
-import os, sys, time
+import os, sys, select, struct
+from array import array
+from collections import deque
 from threading import Thread
 import datetime as dt
 from enum import Enum
@@ -24,7 +26,6 @@ init()
 
 from lib.logger import Logger, Level
 from lib.event import Event
-from lib.rate import Rate
 
 '''
     Pairing and using a bluetooth gamepad device:
@@ -67,12 +68,13 @@ class Gamepad():
             raise ValueError('no configuration provided.')
         self._level = level
         self._log = Logger("gamepad", level)
+        # the log level is fixed, so event handling checks these flags rather than calling the logger
+        self._info_on  = level.value <= Level.INFO.value
+        self._debug_on = level.value <= Level.DEBUG.value
         self._log.info('initialising...')
         self._config = config
         _config = config['ros'].get('gamepad')
         # config
-        _loop_freq_hz = _config.get('loop_freq_hz')
-        self._rate = Rate(_loop_freq_hz)
         self._device_path  = _config.get('device_path')
         self._queue   = queue
         self._message_factory = message_factory
@@ -81,6 +83,9 @@ class Gamepad():
         self._enabled = False
         self._thread  = None
         self._gamepad = None
+        self._wake_fds = None # pipe used to wake the event loop on disable
+        # ( event, value ) pairs parsed from the device but not yet queued
+        self._pending = deque(maxlen=256)
 
     # ..........................................................................
     def connect(self):
@@ -105,6 +110,13 @@ class Gamepad():
         self._log.header('gamepad','Connecting Gamepad...',None)
         try:
             self._gamepad = InputDevice(self._device_path)
+            # non-blocking, so that _drain() returns once the device is empty
+            os.set_blocking(self._gamepad.fd, False)
+            try:
+                # exclusive access: events aren't also delivered to the console or X
+                self._gamepad.grab()
+            except OSError as e:
+                self._log.warning('unable to grab gamepad device: {}'.format(e))
             # display device info
             self._log.info(Fore.GREEN + "gamepad: {}".format(self._gamepad))
             self._log.info('connected.')
@@ -137,43 +149,111 @@ class Gamepad():
     # ......................................................
     @staticmethod
     def convert_range(value):
+        '''
+        Converts an analog stick value (0-255) into an inverted range of
+        about 1.0 to -1.0. Integers in range are found in a lookup table.
+        '''
+        if type(value) is int and 0 <= value < 256:
+            return _AXIS_LUT[value]
         return ( (value - 127.0) / 255.0 ) * -2.0
 
+    # ..........................................................................
+    def attach(self, loop):
+        '''
+        An alternative to enable() for applications running an asyncio event
+        loop: rather than starting its own thread the gamepad registers its
+        device with the loop, which drains and handles events when readable.
+        '''
+        if self._gamepad is None:
+            raise GamepadConnectException(Gamepad._NOT_AVAILABLE_ERROR)
+        loop.add_reader(self._gamepad.fd, self._drain)
+        self._log.info('attached to event loop.')
+
+    # ..........................................................................
+    def detach(self, loop):
+        '''
+        Removes the gamepad device from the asyncio event loop.
+        '''
+        if self._gamepad is not None:
+            loop.remove_reader(self._gamepad.fd)
+            self._log.info('detached from event loop.')
+
+    # ..........................................................................
+    def _drain(self):
+        '''
+        Reads and handles all of the events pending on the gamepad device.
+        Rather than using evdev's read(), which wraps each event in an
+        InputEvent object, this unpacks the kernel's input_event structs
+        directly from the device.
+
+        The whole batch is parsed before any messages are created, so a
+        slow queue consumer doesn't hold up reading the device. Should
+        more than 256 events back up the oldest are dropped.
+        '''
+        try:
+            _data = os.read(self._gamepad.fd, _EVENT_READ_SIZE)
+        except BlockingIOError: # no more events pending
+            return
+        _handle_event = self._handleEvent
+        for _sec, _usec, _type, _code, _value in _EVENT_STRUCT.iter_unpack(_data):
+            _handle_event(_type, _code, _value)
+        self._flush()
+
+    # ..........................................................................
+    def _flush(self):
+        '''
+        Creates a message for each pending event and adds it to the queue.
+        '''
+        _pending = self._pending
+        while _pending:
+            _event, _value = _pending.popleft()
+            _message = self._message_factory.get_message(_event, _value)
+            if self._debug_on:
+                self._log.debug(_TRIGGERED_FORMAT, _message)
+            self._queue.add(_message)
+
     # ..........................................................................
     def _gamepad_loop(self, f_is_enabled):
+        '''
+        Blocks on an epoll of the gamepad device and a wake pipe, draining
+        and handling all pending events whenever the device is readable.
+        The loop uses no CPU while idle; disable() writes to the wake pipe
+        so that the loop exits immediately.
+        '''
         self._log.info('starting event loop...')
-        __enabled = True
-        while __enabled and f_is_enabled():
+        _epoll = select.epoll()
+        try:
+            if self._gamepad is None:
+                raise Exception(Gamepad._NOT_AVAILABLE_ERROR + ' [gamepad no longer available]')
+            _fd = self._gamepad.fd
+            _epoll.register(_fd, select.EPOLLIN)
+            _epoll.register(self._wake_fds[0], select.EPOLLIN)
+            while f_is_enabled():
+                for _ready_fd, _ in _epoll.poll():
+                    if _ready_fd == _fd:
+                        self._drain()
+        except OSError as e:
+            self._log.error(Gamepad._NOT_AVAILABLE_ERROR + ' [lost connection to gamepad]')
+        except Exception as e:
+            self._log.error('gamepad device error: {}'.format(e))
+        finally:
+            '''
+            Note that closing the InputDevice is a bit tricky, and we're currently
+            masking an exception that's always thrown. As there is no data loss on
+            a gamepad event loop being closed suddenly this is not an issue.
+            '''
             try:
-                if self._gamepad is None:
-                    raise Exception(Gamepad._NOT_AVAILABLE_ERROR + ' [gamepad no longer available]')
-                # loop and filter by event code and print the mapped label
-                for event in self._gamepad.read_loop():
-                    self._handleEvent(event)
-                    if not f_is_enabled():
-                        self._log.info(Fore.BLACK + 'event loop.')
-                        break
+                self._log.info(Fore.YELLOW + 'closing gamepad device...')
+                self._gamepad.close()
+                self._log.info(Fore.YELLOW + 'gamepad device closed.')
             except Exception as e:
-                self._log.error('gamepad device error: {}'.format(e))
-            except OSError as e:
-                self._log.error(Gamepad._NOT_AVAILABLE_ERROR + ' [lost connection to gamepad]')
+                self._log.debug('error closing gamepad device: {}'.format(e))
             finally:
-                '''
-                Note that closing the InputDevice is a bit tricky, and we're currently
-                masking an exception that's always thrown. As there is no data loss on
-                a gamepad event loop being closed suddenly this is not an issue.
-                '''
-                try:
-                    self._log.info(Fore.YELLOW + 'closing gamepad device...')
-                    self._gamepad.close()
-                    self._log.info(Fore.YELLOW + 'gamepad device closed.')
-                except Exception as e:
-                    self._log.debug('error closing gamepad device: {}'.format(e))
-                finally:
-                    __enabled = False
-                    self._gamepad_closed = True
-
-            self._rate.wait()
+                self._gamepad_closed = True
+                _epoll.close()
+                for _wake_fd in self._wake_fds:
+                    os.close(_wake_fd)
+                self._wake_fds = None
         self._log.info('exited event loop.')
 
     # ..........................................................................
@@ -194,8 +274,8 @@ class Gamepad():
         elif not self._closed:
             if self._thread is None:
                 self._enabled = True
+                self._wake_fds = os.pipe()
                 self._thread = Thread(name='gamepad', target=Gamepad._gamepad_loop, args=[self, lambda: self._enabled], daemon=True)
-#               self._thread.setDaemon(False)
                 self._thread.start()
                 self._log.info('started.')
             else:
@@ -211,13 +291,13 @@ class Gamepad():
             self._log.warning('already disabled.')
         else:
             self._enabled = False
-            time.sleep(0.2)
+            try:
+                os.write(self._wake_fds[1], b'\x01')
+            except (TypeError, OSError):
+                pass # the event loop has already exited
             # we'll wait a bit for the gamepad device to close...
-            _i = 0
-            while not self._gamepad_closed and _i < 20:
-                _i += 1
-                self._log.info('_i: {:d}'.format(_i))
-                time.sleep(0.1)
+            if self._thread is not None:
+                self._thread.join(timeout=2.0)
             self._log.info('disabled.')
 
     # ..........................................................................
@@ -234,93 +314,38 @@ class Gamepad():
             self._log.warning('already closed.')
 
     # ..........................................................................
-    def _handleEvent(self, event):
+    def _handleEvent(self, event_type, code, value):
         '''
-        Handles the incoming event by filtering on event type and code.
-        There's possibly a more elegant way of doing this but for now this
-        works just fine.
+        Handles the incoming event by filtering on event type and code,
+        where the arguments are the fields of a kernel input_event. The
+        event of a matching control is left pending for _flush().
+        The log messages for each control are found in lookup tables at
+        the bottom of this file.
         '''
-        _message = None
-        _control = None
-        if event.type == ecodes.EV_KEY:
-            _control = GamepadControl.get_by_code(self, event.code)
-            if event.value == 1:
-                if event.code == GamepadControl.A_BUTTON.code:
-                    self._log.info(Fore.RED + "A Button")
-#                   _control = GamepadControl.A_BUTTON
-                elif event.code == GamepadControl.B_BUTTON.code:
-                    self._log.info(Fore.RED + "B Button")
-#                   _control = GamepadControl.B_BUTTON
-                elif event.code == GamepadControl.X_BUTTON.code:
-                    self._log.info(Fore.RED + "X Button")
-#                   _control = GamepadControl.X_BUTTON
-                elif event.code == GamepadControl.Y_BUTTON.code:
-                    self._log.info(Fore.RED + "Y Button")
-#                   _control = GamepadControl.Y_BUTTON
-                elif event.code == GamepadControl.L1_BUTTON.code:
-                    self._log.info(Fore.YELLOW + "L1 Button")
-#                   _control = GamepadControl.L1_BUTTON
-                elif event.code == GamepadControl.L2_BUTTON.code:
-                    self._log.info(Fore.YELLOW + "L2 Button")
-#                   _control = GamepadControl.L2_BUTTON
-                elif event.code == GamepadControl.R1_BUTTON.code:
-                    self._log.info(Fore.YELLOW + "R1 Button")
-#                   _control = GamepadControl.R1_BUTTON
-                elif event.code == GamepadControl.R2_BUTTON.code:
-                    self._log.info(Fore.YELLOW + "R2 Button")
-#                   _control = GamepadControl.R2_BUTTON
-                elif event.code == GamepadControl.START_BUTTON.code:
-                    self._log.info(Fore.GREEN + "Start Button")
-#                   _control = GamepadControl.START_BUTTON
-                elif event.code == GamepadControl.SELECT_BUTTON.code:
-                    self._log.info(Fore.GREEN + "Select Button")
-#                   _control = GamepadControl.SELECT_BUTTON
-                elif event.code == GamepadControl.HOME_BUTTON.code:
-                    self._log.info(Fore.MAGENTA + "Home Button")
-#                   _control = GamepadControl.HOME_BUTTON
+        if event_type == _EV_KEY:
+            if value == 2: # ignore autorepeat
+                return
+            _slot = _CODE_SLOTS[code]
+            if value == 1 and self._info_on:
+                _format = _KEY_LOG_FORMATS.get(code)
+                if _format:
+                    self._log.info(_format)
                 else:
-                    self._log.info(Fore.BLACK + "event type: EV_KEY; event: {}; value: {}".format(event.code, event.value))
-            else:
-    #               self._log.info(Fore.BLACK + Style.DIM + "event type: EV_KEY; value: {}".format(event.value))
-                pass
-        elif event.type == ecodes.EV_ABS:
-            _control = GamepadControl.get_by_code(self, event.code)
-
-            if event.code == GamepadControl.DPAD_HORIZONTAL.code:
-                if event.value == 1:
-                    self._log.info(Fore.CYAN + Style.BRIGHT + "D-Pad Horizontal(Right) {}".format(event.value))
-                elif event.value == -1:
-                    self._log.info(Fore.CYAN + Style.NORMAL + "D-Pad Horizontal(Left) {}".format(event.value))
-                else:
-                    self._log.info(Fore.BLACK + "D-Pad Horizontal(N) {}".format(event.value))
-            elif event.code == GamepadControl.DPAD_VERTICAL.code:
-                if event.value == -1:
-                    self._log.info(Fore.CYAN + Style.NORMAL + "D-Pad Vertical(Up) {}".format(event.value))
-                elif event.value == 1:
-                    self._log.info(Fore.CYAN + Style.BRIGHT + "D-Pad Vertical(Down) {}".format(event.value))
-                else:
-                    self._log.info(Fore.BLACK + "D-Pad Vertical(N) {}".format(event.value))
-
-            elif event.code == GamepadControl.L3_VERTICAL.code:
-                self._log.debug(Fore.MAGENTA + "L3 Vertical {}".format(event.value))
-            elif event.code == GamepadControl.L3_HORIZONTAL.code:
-                self._log.debug(Fore.YELLOW + "L3 Horizontal {}".format(event.value))
-            elif event.code == GamepadControl.R3_VERTICAL.code:
-                self._log.debug(Fore.CYAN + "R3 Vertical {}".format(event.value))
-#               _control = GamepadControl.R3_VERTICAL
-            elif event.code == GamepadControl.R3_HORIZONTAL.code:
-                self._log.debug(Fore.GREEN + "R3 Horizontal {}".format(event.value))
-#               _control = GamepadControl.R3_HORIZONTAL
-            else:
-    #           self._log.info(Fore.BLACK + "type: EV_ABS; event code: {}; value: {}".format(event.code, event.value))
-                pass
-        else:
-    #       self._log.info(Fore.BLACK + Style.DIM + "ZZ. event type: {}; code: {}; value: {}".format(event.type, event.code, event.value))
-            pass
-        if _control != None:
-            _message = self._message_factory.get_message(_control.event, event.value)
-            self._log.debug(Fore.CYAN + Style.BRIGHT + "triggered control with message {}".format(_message))
-            self._queue.add(_message)
+                    self._log.info(_KEY_EVENT_FORMAT, code, value)
+        elif event_type == _EV_ABS:
+            _slot = _CODE_SLOTS[code]
+            if _slot < 0: # an axis we don't use
+                return
+            _formats = _DPAD_LOG_FORMATS.get(code)
+            if _formats:
+                if self._info_on:
+                    self._log.info(_formats.get(value, _formats[0]), value)
+            elif self._debug_on:
+                self._log.debug(_STICK_LOG_FORMATS[code], value)
+        else: # e.g., EV_SYN or EV_MSC, which make up much of the event stream
+            return
+        if _slot >= 0:
+            self._pending.append(( _EVENTS[_slot], value ))
 
 
 # ..............................................................................
@@ -334,7 +359,9 @@ class GamepadControl(Enum):
     This also includes an Event variable, which provides the mapping between
     a specific gamepad control and its corresponding action.
 
-    The @property annotations make sure the respective variable is read-only.
+    The code, label and event are plain attributes rather than read-only
+    properties, as they're read on every gamepad event. Treat them as
+    read-only.
 
     control            num  code  id          control descripton     event
     '''
@@ -347,10 +374,6 @@ class GamepadControl(Enum):
     L2_BUTTON       = ( 6,  312,  'l2',       'L2 Event',            Event.EVENT_L2) # unassigned
     R1_BUTTON       = ( 8,  311,  'r1',       'R1 Lights On',        Event.EVENT_R1) # unassigned
     R2_BUTTON       = ( 7,  313,  'r2',       'R2 Lights Off',       Event.LIGHTS)
-#   L1_BUTTON       = ( 5,  310,  'l1',       'L1 Button',           Event.BUMPER_PORT)
-#   L2_BUTTON       = ( 6,  312,  'l2',       'L2 Button',           Event.BUMPER_CNTR)
-#   R2_BUTTON       = ( 7,  313,  'r2',       'R2 Button',           Event.BUMPER_CNTR)
-#   R1_BUTTON       = ( 8,  311,  'r1',       'R1 Button',           Event.BUMPER_STBD)
 
     START_BUTTON    = ( 9,  315,  'start',    'Start Button',        Event.NO_ACTION)
     SELECT_BUTTON   = ( 10, 314,  'select',   'Select Button',       Event.STANDBY)
@@ -365,37 +388,90 @@ class GamepadControl(Enum):
 
     # ignore the first param since it's already set by __new__
     def __init__(self, num, code, name, label, event):
-        self._code = code
+        # code, label and event are plain attributes as they're read per event
+        self.code  = code
         self._name = name
-        self._label = label
-        self._event = event
-
-    @property
-    def code(self):
-        return self._code
+        self.label = label
+        self.event = event
 
     @property
     def name(self):
         return self._name
 
-    @property
-    def label(self):
-        return self._label
-
-    @property
-    def event(self):
-        return self._event
-
     # ..........................................................................
     @staticmethod
-    def get_by_code(self, code):
-        for ctrl in GamepadControl:
-            if ctrl.code == code:
-#               print(Fore.WHITE + Style.BRIGHT + 'ctrl code: {}'.format(code) + Style.RESET_ALL)
-                return ctrl
+    def get_by_code(code):
+        '''
+        Returns the GamepadControl matching the evdev code, None if no match.
+        '''
+        if 0 <= code < len(_CODE_SLOTS):
+            _slot = _CODE_SLOTS[code]
+            if _slot >= 0:
+                return _CONTROLS[_slot]
         return None
 
 
+# the kernel's struct input_event (a timeval, then type, code and value),
+# in native size and alignment so this works on both 32 and 64 bit systems
+_EVENT_STRUCT = struct.Struct('llHHi')
+_EVENT_READ_SIZE = _EVENT_STRUCT.size * 64
+
+# the event types handled by Gamepad._handleEvent()
+_EV_KEY = ecodes.EV_KEY
+_EV_ABS = ecodes.EV_ABS
+
+# lookup table for Gamepad.convert_range(), for each possible stick value
+_AXIS_LUT = tuple( ( (_value - 127.0) / 255.0 ) * -2.0 for _value in range(256) )
+
+# lookup table for GamepadControl.get_by_code() and Gamepad._handleEvent():
+# a dense array indexed by evdev code (none exceed KEY_MAX) holding the slot
+# of the control in _CONTROLS, or -1 if the code isn't a gamepad control
+_CONTROLS = tuple(GamepadControl)
+_EVENTS   = tuple( _control.event for _control in _CONTROLS ) # parallel to _CONTROLS
+_CODE_SLOTS = array('h', [-1]) * ( ecodes.KEY_MAX + 1 )
+for _slot, _control in enumerate(_CONTROLS):
+    _CODE_SLOTS[_control.code] = _slot
+
+# log formats for unmapped EV_KEY events and triggered controls
+_KEY_EVENT_FORMAT = Fore.BLACK + "event type: EV_KEY; event: %d; value: %d"
+_TRIGGERED_FORMAT = Fore.CYAN + Style.BRIGHT + "triggered control with message %s"
+
+# log messages for EV_KEY button presses, by event code
+_KEY_LOG_FORMATS = {
+    GamepadControl.A_BUTTON.code:      Fore.RED + "A Button",
+    GamepadControl.B_BUTTON.code:      Fore.RED + "B Button",
+    GamepadControl.X_BUTTON.code:      Fore.RED + "X Button",
+    GamepadControl.Y_BUTTON.code:      Fore.RED + "Y Button",
+    GamepadControl.L1_BUTTON.code:     Fore.YELLOW + "L1 Button",
+    GamepadControl.L2_BUTTON.code:     Fore.YELLOW + "L2 Button",
+    GamepadControl.R1_BUTTON.code:     Fore.YELLOW + "R1 Button",
+    GamepadControl.R2_BUTTON.code:     Fore.YELLOW + "R2 Button",
+    GamepadControl.START_BUTTON.code:  Fore.GREEN + "Start Button",
+    GamepadControl.SELECT_BUTTON.code: Fore.GREEN + "Select Button",
+    GamepadControl.HOME_BUTTON.code:   Fore.MAGENTA + "Home Button"
+}
+
+# log formats for the EV_ABS D-pad, by event code then by event value (0 is neutral)
+_DPAD_LOG_FORMATS = {
+    GamepadControl.DPAD_HORIZONTAL.code: {
+         1: Fore.CYAN + Style.BRIGHT + "D-Pad Horizontal(Right) %d",
+        -1: Fore.CYAN + Style.NORMAL + "D-Pad Horizontal(Left) %d",
+         0: Fore.BLACK + "D-Pad Horizontal(N) %d" },
+    GamepadControl.DPAD_VERTICAL.code: {
+        -1: Fore.CYAN + Style.NORMAL + "D-Pad Vertical(Up) %d",
+         1: Fore.CYAN + Style.BRIGHT + "D-Pad Vertical(Down) %d",
+         0: Fore.BLACK + "D-Pad Vertical(N) %d" }
+}
+
+# debug log formats for the EV_ABS analog sticks, by event code
+_STICK_LOG_FORMATS = {
+    GamepadControl.L3_VERTICAL.code:   Fore.MAGENTA + "L3 Vertical %d",
+    GamepadControl.L3_HORIZONTAL.code: Fore.YELLOW + "L3 Horizontal %d",
+    GamepadControl.R3_VERTICAL.code:   Fore.CYAN + "R3 Vertical %d",
+    GamepadControl.R3_HORIZONTAL.code: Fore.GREEN + "R3 Horizontal %d"
+}
+
+
 # ..............................................................................
 class GamepadScan(object):
     '''
@@ -57,7 +57,9 @@ class I2cMaster():
         self._thread = None
         self._enabled = False
         self._closed = False
+        # the bus is held open for the life of the instance, shared by the loop thread
         self._i2c = SMBus(self._channel)
+        self._i2c_lock = threading.Lock()
         self._log.info('ready: imported smbus2 and obtained I²C bus at address 0x{:02X}...'.format(self._device_id))
 
 
@@ -82,9 +84,8 @@ class I2cMaster():
             int.from_bytes(b'\x00\x01', "big")        # 1
             int.from_bytes(b'\x00\x01', "little")     # 256
         '''
-        with SMBus(self._channel) as bus:
-            _byte = bus.read_byte_data(self._device_id, 0)
-            time.sleep(0.01)
+        with self._i2c_lock:
+            _byte = self._i2c.read_byte_data(self._device_id, 0)
         return _byte
 
 
@@ -93,20 +94,21 @@ class I2cMaster():
         '''
             Write a byte to the I²C device at the specified handle.
         '''
-        with SMBus(self._channel) as bus:
-            bus.write_byte(self._device_id, data)
-            time.sleep(0.01)
+        with self._i2c_lock:
+            self._i2c.write_byte(self._device_id, data)
 
 
     # ..........................................................................
     def get_input_from_pin(self, pin):
         '''
             Sends a message to the pin, returning the result as a byte.
+
+            There's no delay between the write and the read: the Arduino
+            samples its pins in its own loop and replies immediately with
+            the last value read, so there's nothing to wait for.
         '''
         self.write_i2c_data(pin)
-#       time.sleep(0.2)
         _received_data  = self.read_i2c_data()
-#       time.sleep(0.2)
         self._log.debug('received response from pin {:d} of {:08b}.'.format(pin, _received_data))
         return _received_data
 
@@ -212,8 +214,8 @@ class I2cMaster():
                     self._thread.join(timeout=1.0)
                     self._log.debug('front sensor loop thread joined.')
                     self._thread = None
+                self._i2c.close()
                 self._closed = True
-#               self._pi.i2c_close(self._handle) # close device
                 self._log.debug('I²C master closed.')
             except Exception as e:
                 self._log.error('error closing master: {}'.format(e))
@@ -57,7 +57,9 @@ class I2cMaster():
         self._thread = None
         self._enabled = False
         self._closed = False
+        # the bus is held open for the life of the instance, shared by the loop thread
         self._i2c = SMBus(self._channel)
+        self._i2c_lock = threading.Lock()
         self._log.info('ready: imported smbus2 and obtained I²C bus at address 0x{:02X}...'.format(self._device_id))
 
 
@@ -83,10 +85,9 @@ class I2cMaster():
             int.from_bytes(b'\x00\x01', "little")     # 256
         '''
 #       self._log.info(Fore.BLUE + Style.BRIGHT + '1. reading byte...')
-        with SMBus(self._channel) as bus:
+        with self._i2c_lock:
 #           _byte = bus.read_byte(self._device_id)
-            _byte = bus.read_byte_data(self._device_id, 0)
-            time.sleep(0.01)
+            _byte = self._i2c.read_byte_data(self._device_id, 0)
 #       self._log.info(Fore.BLUE + Style.BRIGHT + '2. read byte:\t{:08b}'.format(_byte))
 #       self._log.info(Fore.BLUE + Style.BRIGHT + '2. read byte:\t{}'.format(_byte))
         return _byte
@@ -98,9 +99,8 @@ class I2cMaster():
             Write a byte to the I²C device at the specified handle.
         '''
 #       self._log.info(Fore.RED + '1. writing byte:\t{:08b}'.format(data))
-        with SMBus(self._channel) as bus:
-            bus.write_byte(self._device_id, data)
-            time.sleep(0.01)
+        with self._i2c_lock:
+            self._i2c.write_byte(self._device_id, data)
 #           bus.write_byte_data(self._device_id, 0, data)
 #       self._log.info(Fore.RED + '2. wrote byte:\t{}'.format(data))
 
@@ -385,8 +385,8 @@ class I2cMaster():
                     self._thread.join(timeout=1.0)
                     self._log.debug('front sensor loop thread joined.')
                     self._thread = None
+                self._i2c.close()
                 self._closed = True
-#               self._pi.i2c_close(self._handle) # close device
                 self._log.debug('I²C master closed.')
             except Exception as e:
                 self._log.error('error closing master: {}'.format(e))
@@ -12,24 +12,34 @@
 # An Integrated Front Sensor implemented using an Itsy Bitsy M4 Express (an
 # Arduino compatible) in an I²C slave configuration.
 #
+# If 'int_pin' is configured the Arduino's interrupt output is connected to
+# that GPIO pin, and the sensors are only polled while it is held low (plus
+# once every HEARTBEAT_SEC in case an edge is missed).
+#
+# The ItsyBitsy M4 supports 400kHz fast mode I²C, whereas the Raspberry Pi
+# defaults to 100kHz. To run the bus at 400kHz add to /boot/config.txt:
+#
+#   dtparam=i2c_arm=on,i2c_arm_baudrate=400000
+#
 
-import sys, time, threading, itertools
-import datetime as dt
-from colorama import init, Fore, Style
-init()
+import os, sys, time, threading, itertools
+from lib.console import Fore
 
 try:
-    from smbus2 import SMBus
+    from smbus2 import SMBus, i2c_msg
 except Exception:
     sys.exit("This script requires the smbus2 module.\nInstall with: sudo pip3 install smbus2")
 
-from lib.pintype import PinType
 from lib.logger import Logger, Level
 from lib.event import Event
-from lib.message import Message
+from lib.message_factory import MessageFactory
 
 CLEAR_SCREEN = '\n'  # no clear screen
 
+# log formats for each pass of the sensor loop
+_ELAPSED_FORMAT = Fore.WHITE + '[%04d] elapsed: %dms'
+_VALUES_FORMAT  = '[%04d] analog IR (0-255): %d, %d, %d, %d, %d; bumpers (0|1): %d, %d, %d'
+
 # ..............................................................................
 class IntegratedFrontSensor():
     '''
@@ -39,23 +49,33 @@ class IntegratedFrontSensor():
         
         Parameters:
     
-           config: the YAML based application configuration
-           queue:  the message queue receiving activation notifications
-           level:  the logging Level
+           config:          the YAML based application configuration
+           queue:           the message queue receiving activation notifications
+           message_factory: optional MessageFactory
+           level:           the logging Level
     
         Usage:
     
-           _ifs = IntegratedFrontSensor(_config, _queue, Level.INFO)
+           _ifs = IntegratedFrontSensor(_config, _queue, _message_factory, Level.INFO)
            _ifs.enable()
     '''
 
+    # sent in place of a pin number to read all eight pins (1-5, 9-11) at once
+    READ_ALL_COMMAND = 0xFF
+    # when waiting on the interrupt pin, the longest wait before polling anyway
+    HEARTBEAT_SEC = 1.0
+
     # ..........................................................................
-    def __init__(self, config, queue, level):
+    def __init__(self, config, queue, message_factory, level):
         if config is None:
             raise ValueError('no configuration provided.')
         self._config = config['ros'].get('integrated_front_sensor')
         self._queue = queue
         self._log = Logger("ifs", level)
+        if message_factory:
+            self._message_factory = message_factory
+        else:
+            self._message_factory = MessageFactory(level)
         self._device_id                  = self._config.get('device_id') # i2c hex address of slave device, must match Arduino's SLAVE_I2C_ADDRESS
         self._channel                    = self._config.get('channel')
         # short distance:
@@ -68,10 +88,50 @@ class IntegratedFrontSensor():
                 + Fore.RED + ' port side={:>5.2f}; port={:>5.2f};'.format(self._port_side_trigger_distance, self._port_trigger_distance) \
                 + Fore.BLUE + ' center={:>5.2f};'.format(self._center_trigger_distance) \
                 + Fore.GREEN + ' stbd={:>5.2f}; stbd side={:>5.2f}'.format(self._stbd_trigger_distance, self._stbd_side_trigger_distance ))
+        # pin -> ( trigger threshold, event ), as used by _process_batch(). A pin
+        # triggers when its value exceeds the threshold: the bumpers return
+        # 0 or 1 so theirs is zero, and the one test serves for both kinds
+        self._pin_table = {
+            1:  ( self._port_side_trigger_distance, Event.INFRARED_PORT_SIDE ),
+            2:  ( self._port_trigger_distance,      Event.INFRARED_PORT ),
+            3:  ( self._center_trigger_distance,    Event.INFRARED_CNTR ),
+            4:  ( self._stbd_trigger_distance,      Event.INFRARED_STBD ),
+            5:  ( self._stbd_side_trigger_distance, Event.INFRARED_STBD_SIDE ),
+            9:  ( 0, Event.BUMPER_PORT ),
+            10: ( 0, Event.BUMPER_CNTR ),
+            11: ( 0, Event.BUMPER_STBD )
+        }
+        # the ( pin, threshold, event ) of each pin in get_all_inputs() order
+        self._pin_entries = tuple( ( _pin, ) + self._pin_table[_pin] for _pin in ( 1, 2, 3, 4, 5, 9, 10, 11 ) )
+        # bumper pin -> time of its last message, and the debounce interval
+        # within which a bumper won't send another message
+        self._bumper_last_ns = { 9: 0, 10: 0, 11: 0 }
+        self._debounce_ns    = self._config.get('bumper_debounce_ms') * 1000000
+        # event -> pin, as used by _get_pin_for_event(). INFRARED_PORT is an
+        # alias of INFRARED_PORT_SIDE, so the first (lowest) pin is kept
+        self._event_pins = {}
+        for _pin, ( _threshold, _event ) in self._pin_table.items():
+            self._event_pins.setdefault(_event, _pin)
         self._loop_delay_sec = self._config.get('loop_delay_sec')
+        # the GPIO pin held low by the Arduino while any sensor is triggered;
+        # if not configured the sensors are polled every loop_delay_sec
+        self._int_pin = self._config.get('int_pin')
+        # the CPU and SCHED_FIFO priority of the loop thread (optional)
+        self._loop_cpu      = self._config.get('loop_cpu')
+        self._loop_priority = self._config.get('loop_priority')
+        self._irq     = threading.Event()
+        self._pi      = None
+        self._irq_callback = None
+        if self._int_pin is not None:
+            self._configure_interrupt()
         self._log.debug('initialising integrated front sensor...')
         self._counter = itertools.count()
+        # the bus is held open for the life of the sensor rather than per transfer
+        self._bus     = SMBus(self._channel)
+        self._check_bus_speed()
+        self._bus_lock = threading.Lock()
         self._thread  = None
+        self._running = False # true while the loop thread is running
         self._enabled = False
         self._suppressed = False
         self._closing = False
@@ -79,10 +139,59 @@ class IntegratedFrontSensor():
         self._log.info('ready.')
 
     # ..........................................................................
-    def _callback(self, pin, pin_type, value):
+    def _check_bus_speed(self):
+        '''
+            Logs a warning if the I²C bus clock is set below 400kHz (fast
+            mode), as read from the device tree. This is simply advisory.
+        '''
+        _path = '/sys/class/i2c-adapter/i2c-{:d}/of_node/clock-frequency'.format(self._channel)
+        try:
+            with open(_path, 'rb') as _file:
+                _hz = int.from_bytes(_file.read(4), 'big')
+        except OSError:
+            self._log.debug('unable to read I²C bus speed from {}.'.format(_path))
+            return
+        if _hz < 400000:
+            self._log.warning('I²C bus speed is {:d}Hz: set i2c_arm_baudrate=400000 in /boot/config.txt for fast mode.'.format(_hz))
+        else:
+            self._log.info('I²C bus speed: {:d}Hz.'.format(_hz))
+
+    # ..........................................................................
+    def _configure_interrupt(self):
+        '''
+            Sets up a pigpio callback on the falling edge of the Arduino's
+            interrupt pin, which wakes the sensor loop.
+        '''
+        try:
+            import pigpio
+        except ImportError:
+            sys.exit("This script requires the pigpio module.\nInstall with: sudo apt install python3-pigpio")
+        self._pi = pigpio.pi()
+        self._pi.set_mode(self._int_pin, pigpio.INPUT)
+        self._pi.set_pull_up_down(self._int_pin, pigpio.PUD_UP)
+        self._irq_callback = self._pi.callback(self._int_pin, pigpio.FALLING_EDGE, self._on_interrupt)
+        self._log.info('waiting on interrupt from GPIO pin {:d}.'.format(self._int_pin))
+
+    # ..........................................................................
+    def _on_interrupt(self, gpio, level, tick):
+        '''
+            The pigpio callback for the interrupt pin, which wakes the loop.
+        '''
+        self._irq.set()
+
+    # ..........................................................................
+    def _is_triggered(self):
+        '''
+            Returns true if polling: either there's no interrupt pin or the
+            Arduino is holding it low, i.e., a sensor is still triggered.
+        '''
+        return self._pi is None or self._pi.read(self._int_pin) == 0
+
+    # ..........................................................................
+    def _process_batch(self, values):
         '''
-            This is the callback method from the I²C Master, whose events are
-            being returned from the Arduino.
+            Processes the values of all eight pins, in the order returned by
+            get_all_inputs(), sending a message for each pin that triggers.
 
             The pin designations for each sensor are hard-coded to match the 
             robot's hardware as well as the Arduino. There's little point in 
@@ -91,39 +200,29 @@ class IntegratedFrontSensor():
             sensors, 9-11 are digital bumper sensors.
         '''
         if not self._enabled or self._suppressed:
-            self._log.debug(Fore.BLACK + Style.DIM + 'SUPPRESSED callback: pin {:d}; type: {}; value: {:d}'.format(pin, pin_type, value))
             return
-#       self._log.debug(Fore.BLACK + Style.BRIGHT + 'callback: pin {:d}; type: {}; value: {:d}'.format(pin, pin_type, value))
-        _message = None
-       
-        # NOTE: the shorter range infrared triggers preclude the longer range triggers 
-        if pin == 1:
-            if value > self._port_side_trigger_distance:
-                _message = Message(Event.INFRARED_PORT_SIDE)
-        elif pin == 2:
-            if value > self._port_trigger_distance:
-                _message = Message(Event.INFRARED_PORT)
-        elif pin == 3:
-            if value > self._center_trigger_distance:
-                _message = Message(Event.INFRARED_CNTR)
-        elif pin == 4:
-            if value > self._stbd_trigger_distance:
-                _message = Message(Event.INFRARED_STBD)
-        elif pin == 5:
-            if value > self._stbd_side_trigger_distance:
-                _message = Message(Event.INFRARED_STBD_SIDE)
-        elif pin == 9:
-            if value == 1:
-                _message = Message(Event.BUMPER_PORT)
-        elif pin == 10:
-            if value == 1:
-                _message = Message(Event.BUMPER_CNTR)
-        elif pin == 11:
-            if value == 1:
-                _message = Message(Event.BUMPER_STBD)
-        if _message is not None:
-            _message.set_value(value)
-            self._queue.add(_message)
+        for ( _pin, _threshold, _event ), _value in zip(self._pin_entries, values):
+            if _value > _threshold:
+                self._trigger(_pin, _event, _value)
+
+    # ..........................................................................
+    def _trigger(self, pin, event, value):
+        '''
+            Sends a message for a triggered pin, ignoring bumper switch bounce.
+        '''
+        if pin in self._bumper_last_ns:
+            _now = time.perf_counter_ns()
+            if _now - self._bumper_last_ns[pin] < self._debounce_ns:
+                return
+            self._bumper_last_ns[pin] = _now
+        self._fire_message(event, value)
+
+    # ..........................................................................
+    def _fire_message(self, event, value):
+        '''
+            Adds a new message for the event and value to the queue.
+        '''
+        self._queue.add(self._message_factory.get_message(event, value))
 
     # ..........................................................................
     def suppress(self, state):
@@ -147,76 +246,77 @@ class IntegratedFrontSensor():
         '''
             Returns true if the main loop is active (the thread is alive).
         '''
-        return self._thread != None and self._thread.is_alive()
+        return self._running
+
+    # ..........................................................................
+    def _set_loop_scheduling(self):
+        '''
+            Pins the calling (loop) thread to a single CPU and moves it to the
+            SCHED_FIFO real-time scheduling class, so that its polling period
+            isn't subject to the jitter of competing with other processes.
+            This requires root privileges; otherwise the loop carries on
+            under the default scheduler.
+        '''
+        try:
+            if self._loop_cpu is not None:
+                os.sched_setaffinity(0, { self._loop_cpu })
+                self._log.info('sensor loop pinned to CPU {:d}.'.format(self._loop_cpu))
+            if self._loop_priority is not None:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self._loop_priority))
+                self._log.info('sensor loop scheduled SCHED_FIFO at priority {:d}.'.format(self._loop_priority))
+        except (OSError, AttributeError) as e:
+            self._log.warning('unable to set sensor loop scheduling: {}'.format(e))
 
     # ..........................................................................
     def _front_sensor_loop(self):
         self._log.info('starting event loop...\n')
+        self._running = True
+        self._set_loop_scheduling()
+        # bound once rather than looked up on every pass
+        _next_count     = self._counter.__next__
+        _process_batch  = self._process_batch
+        _get_all_inputs = self.get_all_inputs
+        _is_enabled_for = self._log.is_enabled_for
+        # sleep until a deadline rather than for a fixed delay, so that the
+        # period of the loop doesn't include the time spent in each pass
+        _period   = self._loop_delay_sec
+        _deadline = time.perf_counter() + _period
+
+        try:
+            while self._enabled:
+                _count = _next_count()
+#               print(CLEAR_SCREEN)
+
+                self._irq.clear() # any edge from here on means a fresh trigger
+                _start_time = time.perf_counter_ns()
+
+                _values = _get_all_inputs()
+
+                _elapsed_ms = ( time.perf_counter_ns() - _start_time ) // 1000000
+                # typically 173ms from ItsyBitsy, 85ms from Pimoroni IO Expander
+
+                # checked each pass, as the logger may be suppressed at any time
+                if _is_enabled_for(Level.INFO):
+                    self._log.info(_ELAPSED_FORMAT, _count, _elapsed_ms)
+                if _is_enabled_for(Level.DEBUG):
+                    self._log.debug(_VALUES_FORMAT, _count, *_values)
+
+                _process_batch(_values)
+
+                if self._is_triggered():
+                    _remaining = _deadline - time.perf_counter()
+                    if _remaining > 0.0:
+                        time.sleep(_remaining)
+                        _deadline += _period
+                    else: # overran, so start the next period from now
+                        self._log.warning('sensor loop overran its period by %.1fms.', -_remaining * 1000.0)
+                        _deadline = time.perf_counter() + _period
+                else: # idle until the Arduino signals a trigger, checking in now and then
+                    self._irq.wait(IntegratedFrontSensor.HEARTBEAT_SEC)
+                    _deadline = time.perf_counter() + _period
+        finally:
+            self._running = False
 
-        while self._enabled:
-            _count = next(self._counter)
-#           print(CLEAR_SCREEN)
-
-            _start_time = dt.datetime.now()
-
-            _port_side_data = self.get_input_for_event_type(Event.INFRARED_PORT_SIDE)
-            _port_data      = self.get_input_for_event_type(Event.INFRARED_PORT)
-            _cntr_data      = self.get_input_for_event_type(Event.INFRARED_CNTR)
-            _stbd_data      = self.get_input_for_event_type(Event.INFRARED_STBD)
-            _stbd_side_data = self.get_input_for_event_type(Event.INFRARED_STBD_SIDE)
-            _port_bmp_data  = self.get_input_for_event_type(Event.BUMPER_PORT)
-            _cntr_bmp_data  = self.get_input_for_event_type(Event.BUMPER_CNTR)
-            _stbd_bmp_data  = self.get_input_for_event_type(Event.BUMPER_STBD)
-
-            _delta = dt.datetime.now() - _start_time
-            _elapsed_ms = int(_delta.total_seconds() * 1000) 
-            # typically 173ms from ItsyBitsy, 85ms from Pimoroni IO Expander
-
-            self._log.info( Fore.WHITE + '[{:04d}] elapsed: {:d}ms'.format(_count, _elapsed_ms))
-
-            # pin 1: analog infrared sensor ................
-            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 1) + ( Fore.RED if ( _port_side_data > 100.0 ) else Fore.YELLOW ) \
-                    + Style.BRIGHT + '{:d}'.format(_port_side_data) + Style.DIM + '\t(analog value 0-255)')
-            self._callback(1, PinType.ANALOG_INPUT, _port_side_data)
-
-            # pin 2: analog infrared sensor ................
-            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 2) + ( Fore.RED if ( _port_data > 100.0 ) else Fore.YELLOW ) \
-                    + Style.BRIGHT + '{:d}'.format(_port_data) + Style.DIM + '\t(analog value 0-255)')
-            self._callback(2, PinType.ANALOG_INPUT, _port_data)
-
-            # pin 3: analog infrared sensor ................
-            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 3) + ( Fore.RED if ( _cntr_data > 100.0 ) else Fore.YELLOW ) \
-                    + Style.BRIGHT + '{:d}'.format(_cntr_data) + Style.DIM + '\t(analog value 0-255)')
-            self._callback(3, PinType.ANALOG_INPUT, _cntr_data)
-
-            # pin 4: analog infrared sensor ................
-            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 4) + ( Fore.RED if ( _stbd_data > 100.0 ) else Fore.YELLOW ) \
-                    + Style.BRIGHT + '{:d}'.format(_stbd_data) + Style.DIM + '\t(analog value 0-255)')
-            self._callback(4, PinType.ANALOG_INPUT, _stbd_data)
-
-            # pin 5: analog infrared sensor ................
-            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 5) + ( Fore.RED if ( _stbd_side_data > 100.0 ) else Fore.YELLOW ) \
-                    + Style.BRIGHT + '{:d}'.format(_stbd_side_data) + Style.DIM + '\t(analog value 0-255)')
-            self._callback(5, PinType.ANALOG_INPUT, _stbd_side_data)
-
-            # pin 9: digital bumper sensor .................
-            self._log.debug('[{:04d}] DIGITAL IR ({:d}):      \t'.format(_count, 9) + Fore.GREEN + Style.BRIGHT  + '{:d}'.format(_port_bmp_data) \
-                    + Style.DIM + '\t(displays digital pup value 0|1)')
-            self._callback(9, PinType.DIGITAL_INPUT_PULLUP, _port_bmp_data)
-
-            # pin 10: digital bumper sensor ................
-            self._log.debug('[{:04d}] DIGITAL IR ({:d}):      \t'.format(_count, 10) + Fore.GREEN + Style.BRIGHT  + '{:d}'.format(_cntr_bmp_data) \
-                    + Style.DIM + '\t(displays digital pup value 0|1)')
-            self._callback(10, PinType.DIGITAL_INPUT_PULLUP, _cntr_bmp_data)
-
-            # pin 11: digital bumper sensor ................
-            self._log.debug('[{:04d}] DIGITAL IR ({:d}):      \t'.format(_count, 11) + Fore.GREEN + Style.BRIGHT  + '{:d}'.format(_stbd_bmp_data) \
-                    + Style.DIM + '\t(displays digital pup value 0|1)')
-            self._callback(11, PinType.DIGITAL_INPUT_PULLUP, _stbd_bmp_data)
-
-            time.sleep(self._loop_delay_sec)
-
-        # we never get here if using 'while True:'
         self._log.info('exited event loop.')
 
     # ..........................................................................
@@ -237,68 +337,49 @@ class IntegratedFrontSensor():
         else:
             self._log.warning('cannot enable: already closed.')
 
-    # ..............................................................................
-    def read_i2c_data(self):
-        '''
-            Read a byte from the I²C device at the specified handle, returning the value.
-
-            ## Examples:
-            int.from_bytes(b'\x00\x01', "big")        # 1
-            int.from_bytes(b'\x00\x01', "little")     # 256
-        '''
-        with SMBus(self._channel) as bus:
-            _byte = bus.read_byte_data(self._device_id, 0)
-            time.sleep(0.01)
-        return _byte
-
     # ..........................................................................
-    def write_i2c_data(self, data):
+    def get_all_inputs(self):
         '''
-            Write a byte to the I²C device at the specified handle.
+            Returns the values of all eight pins as a list, in the order
+            1-5 (the analog infrared sensors) then 9-11 (the bumpers), read
+            from the Arduino as a single 8 byte I²C block read.
         '''
-        with SMBus(self._channel) as bus:
-            bus.write_byte(self._device_id, data)
-            time.sleep(0.01)
+        with self._bus_lock:
+            return self._bus.read_i2c_block_data(self._device_id, IntegratedFrontSensor.READ_ALL_COMMAND, 8)
 
     # ..........................................................................
     def _get_pin_for_event(self, event):
         '''
             Return the hardwired pin corresponding to the Event type.
         '''
-        if event is Event.INFRARED_PORT_SIDE:
-            return 1
-        elif event is Event.INFRARED_PORT:
-            return 2
-        elif event is Event.INFRARED_CNTR:
-            return 3
-        elif event is Event.INFRARED_STBD:
-            return 4
-        elif event is Event.INFRARED_STBD_SIDE:
-            return 5
-        elif event is Event.BUMPER_PORT:
-            return 9
-        elif event is Event.BUMPER_CNTR:
-            return 10
-        elif event is Event.BUMPER_STBD:
-            return 11
-        else:
+        _pin = self._event_pins.get(event)
+        if _pin is None:
             raise Exception('unexpected event type.')
+        return _pin
 
     # ..........................................................................
     def get_input_for_event_type(self, event):
         '''
             Sends a message to the pin, returning the result as a byte.
+
+            The pin number is written and the value read back as a single
+            combined I²C transaction (with a repeated START between the
+            write and the read), rather than as two separate transfers.
         '''
         _pin = self._get_pin_for_event(event)
-        self.write_i2c_data(_pin)
-        _received_data  = self.read_i2c_data()
-        self._log.debug('received response from pin {:d} of {:08b}.'.format(_pin, _received_data))
+        _write = i2c_msg.write(self._device_id, [ _pin ])
+        _read  = i2c_msg.read(self._device_id, 1)
+        with self._bus_lock:
+            self._bus.i2c_rdwr(_write, _read)
+        _received_data = list(_read)[0]
+        self._log.debug('received response from pin %d of %s.', _pin, format(_received_data, '08b'))
         return _received_data
 
     # ..........................................................................
     def disable(self):
         self._log.info('disabled integrated front sensor.')
         self._enabled = False
+        self._irq.set() # wake the loop so it can exit
 
     # ..........................................................................
     def close(self):
@@ -313,12 +394,16 @@ class IntegratedFrontSensor():
             self._log.info('closing...')
             try:
                 self._enabled = False
+                self._irq.set()
                 if self._thread != None:
                     self._thread.join(timeout=1.0)
                     self._log.debug('front sensor loop thread joined.')
                     self._thread = None
+                if self._irq_callback is not None:
+                    self._irq_callback.cancel()
+                    self._pi.stop()
+                self._bus.close()
                 self._closed = True
-#               self._pi.i2c_close(self._handle) # close device
                 self._log.info('closed.')
             except Exception as e:
                 self._log.error('error closing: {}'.format(e))
@@ -52,6 +52,18 @@ class Indicator():
         self._rgbmatrix5x5.set_clear_on_exit()
         self._height = self._rgbmatrix5x5.height
         self._width  = self._rgbmatrix5x5.width
+        # dispatch table for update(): event -> ( pixel x, pixel y, color, log format )
+        # note that INFRARED_PORT is an alias of INFRARED_PORT_SIDE (they share a value)
+        self._handlers = {
+            Event.INFRARED_PORT_SIDE: ( 4, 4, Color.RED,   Fore.RED + Style.BRIGHT   + 'event: %s;\tvalue: %5.2f' ),
+            Event.INFRARED_CNTR:      ( 4, 2, Color.BLUE,  Fore.BLUE + Style.BRIGHT  + 'event: %s;\tvalue: %5.2f' ),
+            Event.INFRARED_STBD:      ( 4, 1, Color.CYAN,  Fore.GREEN + Style.BRIGHT + 'event: %s;\tvalue: %5.2f' ),
+            Event.INFRARED_STBD_SIDE: ( 4, 0, Color.GREEN, Fore.GREEN + Style.BRIGHT + 'event: %s;\tvalue: %5.2f' ),
+            Event.BUMPER_PORT:        ( 3, 3, Color.RED,   Fore.RED + Style.BRIGHT   + 'event: %s;\tvalue: %d' ),
+            Event.BUMPER_CNTR:        ( 3, 2, Color.BLUE,  Fore.BLUE + Style.BRIGHT  + 'event: %s;\tvalue: %d' ),
+            Event.BUMPER_STBD:        ( 3, 1, Color.GREEN, Fore.GREEN + Style.BRIGHT + 'event: %s;\tvalue: %d' )
+        }
+        self._lit = None # the ( x, y ) of the currently lit sensor pixel
         self._log.info('ready.')
 
 
@@ -61,45 +73,32 @@ class Indicator():
             Receives a message and reacts by setting the display accordingly.
             This does not modify the message.
         '''
-        self._log.debug('added message #{}: priority {}: {}'.format(message.number, message.priority, message.description))
-        event = message.event
-
-        if event is Event.INFRARED_PORT_SIDE:
-            self.set_ir_sensor_port_side(True, False)
-            self._log.debug(Fore.RED + Style.BRIGHT   + 'event: {};\tvalue: {:5.2f}'.format(event.description, message.value))
-
-        elif event is Event.INFRARED_PORT:
-            self.set_ir_sensor_port(True, False)
-            self._log.debug(Fore.RED + Style.BRIGHT   + 'event: {};\tvalue: {:5.2f}'.format(event.description, message.value))
-
-        elif event is Event.INFRARED_CNTR:
-            self.set_ir_sensor_center(True, False)
-            self._log.info(Fore.BLUE + Style.BRIGHT  + 'event: {};\tvalue: {:5.2f}'.format(event.description, message.value))
-
-        elif event is Event.INFRARED_STBD:
-            self.set_ir_sensor_stbd(True, False)
-            self._log.debug(Fore.GREEN + Style.BRIGHT + 'event: {};\tvalue: {:5.2f}'.format(event.description, message.value))
-
-        elif event is Event.INFRARED_STBD_SIDE:
-            self.set_ir_sensor_stbd_side(True, False)
-            self._log.debug(Fore.GREEN + Style.BRIGHT + 'event: {};\tvalue: {:5.2f}'.format(event.description, message.value))
-
-        elif event is Event.BUMPER_PORT:
-            self.set_bumper_port(True)
-            self._log.debug(Fore.RED + Style.BRIGHT   + 'event: {};\tvalue: {:d}'.format(event.description, message.value))
-        elif event is Event.BUMPER_CNTR:
-            self.set_bumper_center(True)
-            self._log.debug(Fore.BLUE + Style.BRIGHT  + 'event: {};\tvalue: {:d}'.format(event.description, message.value))
-        elif event is Event.BUMPER_STBD:
-            self.set_bumper_stbd(True)
-            self._log.debug(Fore.GREEN + Style.BRIGHT + 'event: {};\tvalue: {:d}'.format(event.description, message.value))
-        else:
-            self._log.debug(Fore.RED + 'other event: {}'.format(event.description))
-            pass
-        self.clear()
+        if self._log.is_enabled_for(Level.DEBUG):
+            self._log.debug('added message #%s: priority %s: %s', message.number, message.priority, message.description)
+        self.update(message.event, message.value)
+
+    # ..........................................................................
+    def update(self, event, value):
+        '''
+            Displays the sensor pixel for the event, turning off the pixel
+            of any previous event, as a single frame written to the display.
+            Events that have no sensor pixel leave the display unchanged.
+        '''
+        _handler = self._handlers.get(event)
+        if _handler is None:
+            self._log.debug(Fore.RED + 'other event: %s', event.description)
+            return
+        _x, _y, _color, _format = _handler
+        if self._lit is not None and self._lit != ( _x, _y ):
+            self._rgbmatrix5x5.set_pixel(*self._lit, *Color.BLACK.rgb)
+        self._rgbmatrix5x5.set_pixel(_x, _y, *_color.rgb)
+        self._rgbmatrix5x5.show()
+        self._lit = ( _x, _y )
+        self._log.debug(_format, event.description, value)
 
     # ..........................................................................
     def clear(self):
+        self._lit = None
         self.set_color(Color.BLACK)
 
     # ..........................................................................
@@ -107,7 +106,7 @@ class Indicator():
 #       for y in range(self._height):
 #           for x in range(self._width):
 #               self._rgbmatrix5x5.set_pixel(x, y, color.red, color.green, color.blue)
-        self._rgbmatrix5x5.set_all(color.red, color.green, color.blue)
+        self._rgbmatrix5x5.set_all(*color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -119,7 +118,7 @@ class Indicator():
         '''
         _offset = 0
         if hue < 0:
-            r, g, b = [ Color.VERY_DARK_GREY.red, Color.VERY_DARK_GREY.green, Color.VERY_DARK_GREY.blue ]
+            r, g, b = Color.VERY_DARK_GREY.rgb
             self._log.debug(Fore.WHITE + Style.NORMAL + 'uncalibrated; hue {}: rgb: {}/{}/{}'.format(hue, r, g, b))
         else:
             h = ((hue + _offset) % 360) / 360.0
@@ -141,33 +140,33 @@ class Indicator():
     # ..........................................................................
     def set_direction_fwd(self, enable):
         _color = Color.CYAN if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(2, 1, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(2, 2, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(2, 3, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(2, 1, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(2, 2, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(2, 3, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_direction_port(self, enable):
         _color = Color.RED if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(0, 4, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(1, 4, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(2, 4, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(0, 4, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(1, 4, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(2, 4, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_direction_aft(self, enable):
         _color = Color.YELLOW if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(0, 1, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(0, 2, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(0, 3, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(0, 1, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(0, 2, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(0, 3, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_direction_stbd(self, enable):
         _color = Color.GREEN if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(0, 0, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(1, 0, _color.red, _color.green, _color.blue)
-        self._rgbmatrix5x5.set_pixel(2, 0, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(0, 0, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(1, 0, *_color.rgb)
+        self._rgbmatrix5x5.set_pixel(2, 0, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -179,7 +178,7 @@ class Indicator():
                 _color = Color.RED
         else:
             _color = Color.BLACK
-        self._rgbmatrix5x5.set_pixel(4, 4, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(4, 4, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -191,7 +190,7 @@ class Indicator():
                 _color = Color.MAGENTA
         else:
             _color = Color.BLACK
-        self._rgbmatrix5x5.set_pixel(4, 3, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(4, 3, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -203,7 +202,7 @@ class Indicator():
                 _color = Color.BLUE
         else:
             _color = Color.BLACK
-        self._rgbmatrix5x5.set_pixel(4, 2, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(4, 2, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -215,7 +214,7 @@ class Indicator():
                 _color = Color.CYAN
         else:
             _color = Color.BLACK
-        self._rgbmatrix5x5.set_pixel(4, 1, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(4, 1, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
@@ -227,25 +226,25 @@ class Indicator():
                 _color = Color.GREEN
         else:
             _color = Color.BLACK
-        self._rgbmatrix5x5.set_pixel(4, 0, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(4, 0, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_bumper_port(self, enable):
         _color = Color.RED if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(3, 3, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(3, 3, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_bumper_center(self, enable):
         _color = Color.BLUE if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(3, 2, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(3, 2, *_color.rgb)
         self._rgbmatrix5x5.show()
 
     # ..........................................................................
     def set_bumper_stbd(self, enable):
         _color = Color.GREEN if enable else Color.BLACK
-        self._rgbmatrix5x5.set_pixel(3, 1, _color.red, _color.green, _color.blue)
+        self._rgbmatrix5x5.set_pixel(3, 1, *_color.rgb)
         self._rgbmatrix5x5.show()
 
 #EOF
@@ -10,9 +10,6 @@
 # modified: 2020-03-26
 #
 
-from colorama import init, Fore, Style
-init()
-
 from .devnull import DevNull
 from .logger import Level, Logger
 from .enums import Orientation
@@ -75,6 +72,8 @@ class Infrareds():
 
         self._infrared_port_side  = Infrared(self._queue, _port_side_pin, Orientation.PORT_SIDE, Event.INFRARED_PORT_SIDE, level)
         self._infrared_stbd_side  = Infrared(self._queue, _stbd_side_pin, Orientation.STBD_SIDE, Event.INFRARED_STBD_SIDE, level)
+        self._infrareds = ( self._infrared_port, self._infrared_center, self._infrared_stbd, \
+                self._infrared_port_side, self._infrared_stbd_side )
 
         if self._use_lr_ir:
             self._log.info('infrared pins: port={:d}; center=[LR_IR]; starboard={:d}; port side={:d}; starboard side={:d}'.format(\
@@ -93,22 +92,16 @@ class Infrareds():
     # ..........................................................................
     def enable(self):
         self._log.info('infrared sensors enabled.')
-        self._infrared_port.enable()
-        self._infrared_center.enable()
-        self._infrared_stbd.enable()
-        self._infrared_port_side.enable()
-        self._infrared_stbd_side.enable()
+        for _infrared in self._infrareds:
+            _infrared.enable()
         self._enabled = True
 
 
     # ..........................................................................
     def disable(self):
         self._log.info('infrared sensors disabled.')
-        self._infrared_port.disable()
-        self._infrared_center.disable()
-        self._infrared_stbd.disable()
-        self._infrared_port_side.disable()
-        self._infrared_stbd_side.disable()
+        for _infrared in self._infrareds:
+            _infrared.disable()
         self._enabled = False
 
 
@@ -153,10 +146,7 @@ class Infrareds():
     def close(self):
         self._log.info('infrared sensors closed.')
         self._enabled = False
-        self._infrared_port.close()
-        self._infrared_center.close()
-        self._infrared_stbd.close()
-        self._infrared_port_side.close()
-        self._infrared_stbd_side.close()
+        for _infrared in self._infrareds:
+            _infrared.close()
 
 #EOF
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 by Murray Altheim. All rights reserved. This file is part of
+# the Robot OS project and is released under the "Apache Licence, Version 2.0".
+# Please see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2020-10-15
+#
+#  Provides numba's njit decorator if numba is installed, otherwise a no-op
+#  stand-in so that decorated functions simply run as plain Python.
+#
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        '''
+            A no-op replacement for numba.njit, usable either bare or with
+            arguments, e.g., @njit or @njit(cache=True).
+        '''
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+#EOF
@@ -10,7 +10,7 @@
 # modified: 2020-03-31
 
 # Import library functions we need
-import time
+import time, math
 from colorama import init, Fore, Style
 init()
 
@@ -45,6 +45,7 @@ class Lidar():
             self._max_angle = _config.get('max_angle')
             self._degree_step = _config.get('degree_step')  
             self._step_delay_sec = _config.get('step_delay_sec')  
+            _servo_slew_deg_per_s = _config.get('servo_slew_deg_per_s', 300.0)
             _range_value = _config.get('tof_range')  
             _range = Range.from_str(_range_value)
             _servo_number = _config.get('servo_number')  
@@ -57,6 +58,7 @@ class Lidar():
             self._max_angle =  60.0
             self._degree_step = 3.0
             self._step_delay_sec = 0.01
+            _servo_slew_deg_per_s = 300.0
             _range = Range.PERFORMANCE
 #           _range = Range.LONG
 #           _range = Range.MEDIUM
@@ -66,16 +68,22 @@ class Lidar():
         self._log.info('scan range of {} from {:>4.1f}° to {:>4.1f}° with step of {:>4.1f}°'.format(_range, self._min_angle, self._max_angle, self._degree_step))
         self._servo = Servo(self._config, _servo_number, level)
         self._tof = TimeOfFlight(_range, Level.WARN)
-        self._error_range = 0.067
+        # the angles of the sweep (and of the sweep back), each computed from
+        # its integer step index so there's no accumulated float drift
+        _steps = math.ceil(( self._max_angle - self._min_angle + 0.01 ) / self._degree_step)
+        self._sweep_angles = [ self._min_angle + i * self._degree_step for i in range(_steps) ]
+        self._fore_count = _steps
+        if self._double_sweep:
+            self._sweep_angles += [ self._max_angle - i * self._degree_step for i in range(_steps) ]
+        # the time for the servo to move one degree step and settle
+        self._settle_time = abs(self._degree_step) / _servo_slew_deg_per_s + 0.01
+        # the step delay runs concurrently with the settle time of the next move
+        self._step_wait = max(self._settle_time, self._step_delay_sec)
         self._enabled = False
         self._closed = False
         self._log.info('ready.')
 
 
-    # ..........................................................................
-    def _in_range(self, p, q):
-        return p >= ( q - self._error_range ) and p <= ( q + self._error_range )
-
 
     # ..........................................................................
     def _set_servo_position(self, angle):
@@ -101,10 +109,11 @@ class Lidar():
         try:
     
             start = time.time()
-            _min_mm = 9999.0
-            _angle_at_min = 0.0
-            _max_mm = 0
-            _angle_at_max = 0.0
+
+            # each distance is recorded against its angle's index
+            _angles = self._sweep_angles
+            _fore_count = self._fore_count
+            _distances = numpy.empty(len(_angles), dtype=numpy.int32)
 
             self._set_servo_position(self._min_angle)
             time.sleep(0.3)
@@ -117,50 +126,26 @@ class Lidar():
 #           time.sleep(0.05)
 #           self._log.info(Fore.YELLOW + Style.BRIGHT + 'starting scan from degrees: {:>5.2f}°: waited: {:d}'.format(self._get_servo_position(-1), wait_count))
 
-            # sweep from minimum to maximum ........................................................
+            # sweep from minimum to maximum, then if double sweep, back again ......................
             self._log.info('sweep fore...')
-#           self._log.info('sweep min to max...')
-            for degrees in numpy.arange(self._min_angle, self._max_angle + 0.01, self._degree_step):
+            _debug = self._log.is_enabled_for(Level.DEBUG)
+            for i, degrees in enumerate(_angles):
+                if i == _fore_count:
+                    self._log.info('sweep back...')
                 self._set_servo_position(degrees)
-                wait_count = 0
-                while not self._in_range(self._get_servo_position(degrees), degrees) and wait_count < 10:
-                    time.sleep(0.0025)
-                    wait_count += 1
-                self._log.debug(Fore.GREEN + Style.BRIGHT + 'measured degrees: {:>5.2f}°: \ttarget: {:>5.2f}°; waited: {:d}'.format(\
-                        self._get_servo_position(degrees), degrees, wait_count))
+                time.sleep(self._step_wait)
+                if _debug:
+                    self._log.debug(Fore.GREEN + Style.BRIGHT + 'measured degrees: {:>5.2f}°: \ttarget: {:>5.2f}°'.format(\
+                            self._get_servo_position(degrees), degrees))
                 mm = self._tof.read_distance()
-                self._log.info('distance at {:>5.2f}°: \t{}mm'.format(degrees, mm))
-                # capture min and max at angles
-                _min_mm = min(_min_mm, mm)
-                if mm == _min_mm:
-                    _angle_at_min = degrees
-                _max_mm = max(_max_mm, mm)
-                if mm == _max_mm:
-                    _angle_at_max = degrees
-                time.sleep(self._step_delay_sec)
-
-            if self._double_sweep:
-                self._log.info('sweep back...')
-#               self._log.info('sweep max to min...')
-                # sweep from maximum to minimum ........................................................
-                for degrees in numpy.arange(self._max_angle, self._min_angle + 0.01, -1.0 * self._degree_step):
-                    self._set_servo_position(degrees)
-                    wait_count = 0
-                    while not self._in_range(self._get_servo_position(degrees), degrees) and wait_count < 10:
-                        time.sleep(0.0025)
-                        wait_count += 1
-                    self._log.debug(Fore.GREEN + Style.BRIGHT + 'measured degrees: {:>5.2f}°: \ttarget: {:>5.2f}°; waited: {:d}'.format(\
-                            self._get_servo_position(degrees), degrees, wait_count))
-                    mm = self._tof.read_distance()
-                    self._log.info('distance at {:>5.2f}°: \t{}mm'.format(degrees, mm))
-                    # capture min and max at angles
-                    _min_mm = min(_min_mm, mm)
-                    if mm == _min_mm:
-                        _angle_at_min = degrees
-                    _max_mm = max(_max_mm, mm)
-                    if mm == _max_mm:
-                        _angle_at_max = degrees
-                    time.sleep(self._step_delay_sec)
+                self._log.info('distance at %5.2f°: \t%dmm', degrees, mm)
+                _distances[i] = mm
+
+            # capture min and max at angles (the first angle at which each occurs)
+            _i_min = int(_distances.argmin())
+            _i_max = int(_distances.argmax())
+            _min_mm, _angle_at_min = int(_distances[_i_min]), _angles[_i_min]
+            _max_mm, _angle_at_max = int(_distances[_i_max]), _angles[_i_max]
 
             time.sleep(0.1)
 #           self._log.info('complete.')
@@ -20,6 +20,14 @@ class Level(Enum):
     ERROR    = logging.ERROR     # 40
     CRITICAL = logging.CRITICAL  # 50
 
+# message prefixes and suffix, with their colors resolved once at load
+_DEBUG_PREFIX    = Fore.BLACK + "DEBUG : "
+_INFO_PREFIX     = Fore.CYAN + "INFO  : "
+_WARN_PREFIX     = Fore.YELLOW + "WARN  : "
+_ERROR_PREFIX    = Fore.RED + Style.NORMAL + "ERROR : " + Style.BRIGHT
+_CRITICAL_PREFIX = Fore.WHITE + "FATAL : " + Style.BRIGHT
+_RESET           = Style.RESET_ALL
+
 # ..............................................................................
 class Logger:
 
@@ -87,33 +95,46 @@ class Logger:
         self._mutex = mutex
 
     # ..........................................................................
-    def debug(self, message):
-        if not self.suppressed:
+    def is_enabled_for(self, level):
+        '''
+           Returns True if a message of the provided Level would be logged.
+           Callers can use this to skip building expensive messages.
+        '''
+        return not self.suppressed and self.__log.isEnabledFor(level.value)
+
+    # ..........................................................................
+    # The following methods accept optional %-style arguments, which are only
+    # merged into the message if it is actually logged, e.g.:
+    #
+    #    self._log.debug('value: %5.2f', value)
+    #
+    def debug(self, message, *args):
+        if not self.suppressed and self.__log.isEnabledFor(logging.DEBUG):
             with self._mutex:
-                self.__log.debug(Fore.BLACK + "DEBUG : " + message + Style.RESET_ALL)
+                self.__log.debug(_DEBUG_PREFIX + message + _RESET, *args)
 
     # ..........................................................................
-    def info(self, message):
-        if not self.suppressed:
+    def info(self, message, *args):
+        if not self.suppressed and self.__log.isEnabledFor(logging.INFO):
             with self._mutex:
-                self.__log.info(Fore.CYAN + "INFO  : " + message + Style.RESET_ALL)
+                self.__log.info(_INFO_PREFIX + message + _RESET, *args)
 
     # ..........................................................................
-    def warning(self, message):
+    def warning(self, message, *args):
         if not self.suppressed:
             with self._mutex:
-                self.__log.warning(Fore.YELLOW + "WARN  : " + message + Style.RESET_ALL)
+                self.__log.warning(_WARN_PREFIX + message + _RESET, *args)
 
     # ..........................................................................
-    def error(self, message):
+    def error(self, message, *args):
         if not self.suppressed:
             with self._mutex:
-                self.__log.error(Fore.RED + Style.NORMAL + "ERROR : " + Style.BRIGHT + message + Style.RESET_ALL)
+                self.__log.error(_ERROR_PREFIX + message + _RESET, *args)
 
     # ..........................................................................
-    def critical(self, message):
+    def critical(self, message, *args):
         with self._mutex:
-            self.__log.critical(Fore.WHITE + "FATAL : " + Style.BRIGHT + message + Style.RESET_ALL)
+            self.__log.critical(_CRITICAL_PREFIX + message + _RESET, *args)
 
     # ..........................................................................
     def file(self, message):
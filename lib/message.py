@@ -34,7 +34,14 @@ class Message(object):
         Don't create one of these directly: use the MessageFactory!
 
         Wraps an Event in a Message indicating the intention to execute an Action.
+
+        As Messages are created for every sensor and gamepad event they use
+        __slots__, which makes them smaller and quicker to allocate. They're
+        deliberately not pooled or recycled: a Message may remain on the
+        queue or with a consumer for an indeterminate time.
     '''
+    __slots__ = ( '_eid', '_number', '_event', '_description', '_priority', '_timestamp', '_state', '_value' )
+
     def __init__(self, eid, event, value):
         self._eid         = eid # internal immutable ID
         self._number      = -1  # externally-assigned ID, unassigned at instantiation
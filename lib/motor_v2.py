@@ -10,21 +10,20 @@
 # modified: 2020-08-30
 #
 
-import time
+import time, math, threading
 from colorama import init, Fore, Style
 init()
 
-try:
-    import numpy
-except ImportError:
-    exit("This script requires the numpy module\nInstall with: sudo pip install numpy")
-
 from lib.logger import Level, Logger
 from lib.devnull import DevNull
 from lib.enums import Direction, Orientation, Speed
 from lib.slew import SlewRate
 from lib.rotary_encoder import Decoder
 
+# debug formats, with their colors resolved once at load
+_STEPS_FORMAT = Fore.BLACK + '%s: %+d steps'
+_POWER_FORMAT = Fore.MAGENTA + Style.BRIGHT + 'power argument: %5.2f' + Style.NORMAL + '\tcurrent power: %5.2f; driving power: %5.2f.'
+
 # ..............................................................................
 class Motor():
     '''
@@ -33,6 +32,8 @@ class Motor():
 
         This uses the ros:motors: section of the configuration.
     '''
+    _motors = [] # every Motor created, so that cancel() can reset their power
+
     def __init__(self, config, tb, pi, orientation, level):
         global TB
         super(Motor, self).__init__()
@@ -56,8 +57,17 @@ class Motor():
             self._orientation = Orientation.STBD if orientation is Orientation.PORT else Orientation.PORT
         else:
             self._orientation = orientation
+        self._is_port = self._orientation is Orientation.PORT
+        # the ThunderBorg channel for this motor, resolved once
+        if self._is_port:
+            self._set_motor = tb.SetMotor1
+            self._get_motor = tb.GetMotor1
+        else:
+            self._set_motor = tb.SetMotor2
+            self._get_motor = tb.GetMotor2
         # NOW we can create the logger
         self._log = Logger('motor:{}'.format(orientation.label), level)
+        self._debug_on = self._log.is_enabled_for(Level.DEBUG) # checked on each encoder pulse
         self._log.info('initialising {} motor...'.format(orientation))
         self._log.debug('_reverse_motor_orientation: {}'.format(self._reverse_motor_orientation))
         self._reverse_encoder_orientation = cfg.get('reverse_encoder_orientation')
@@ -83,19 +93,44 @@ class Motor():
         # acceleration loop delay
         self._accel_loop_delay_sec = cfg.get('accel_loop_delay_sec') # default: 0.10
         self._log.debug('acceleration loop delay: {:>5.2f} sec'.format(self._accel_loop_delay_sec))
+        # motor feedforward constants: power per unit velocity and per unit velocity/sec
+        self._kv = cfg.get('feedforward_kv') # default: 0.010
+        self._ka = cfg.get('feedforward_ka') # default: 0.003
+        self._log.debug('feedforward kV: {:>7.5f}; kA: {:>7.5f}'.format(self._kv, self._ka))
         # end configuration ................................
 
         self._motor_power_limit = 0.99       # power limit to motor
+        self._neg_motor_power_limit = -self._motor_power_limit
         self._steps = 0                      # step counter
         self._steps_begin = 0                # step count at beginning of velocity measurement
+        self._pulses_until_sample = self._sample_rate # pulses remaining in the current velocity measurement
         self._velocity = 0.0                 # current velocity
+        self._velocity_ema = 0.0             # exponential moving average of velocity
+        self._velocity_eta = 0.9             # weight of the previous average in each update
         self._max_velocity = 0.0             # capture maximum velocity attained
         self._max_power = 0.0                # capture maximum power applied
         self._max_driving_power = 0.0        # capture maximum adjusted power applied
+        self._commanded_power = 0.0          # the power last commanded of the motor
+        self._pending_power = None           # the latest power awaiting the writer thread
+        self._power_event = threading.Event()
+        self._power_lock = threading.Lock()  # orders the writer's writes against stop()
+        self._writer = None
+        self._v_nominal = None               # battery voltage when the max power ratio was set
+        self._vbus_correction = 1.0          # nominal over current battery voltage
+        # the discrete-time feedforward over one loop delay: the velocity
+        # decays by _ff_a per period, so u = kV * ( next - _ff_a * current ) / ( 1 - _ff_a )
+        self._ff_a = math.exp(-self._kv / self._ka * self._accel_loop_delay_sec)
+        self._ff_gain = self._kv / ( 1.0 - self._ff_a )
         self._interrupt = False              # used to interrupt loops
-        self._stepcount_timestamp = time.time()  # timestamp at beginning of velocity measurement
+        self._stepcount_timestamp = time.monotonic()  # timestamp at beginning of velocity measurement
+        self._last_pulse_time = self._stepcount_timestamp # timestamp of the most recent encoder pulse
+        self._snapshot = ( 0, 0.0, self._stepcount_timestamp ) # ( steps, velocity, timestamp ) at the last sample
         self._start_timestamp = time.time()  # timestamp at beginning of velocity measurement
 
+        # the sign applied to each encoder pulse: forward is positive on the
+        # port motor and negative on starboard, the reverse if reconfigured
+        self._pulse_sign = 1 if self._is_port != bool(self._reverse_encoder_orientation) else -1
+
         # configure encoder ................................
         self._log.info('configuring rotary encoders...')
         if self._reverse_encoder_orientation:
@@ -106,25 +141,82 @@ class Motor():
         else:
             self.configure_encoder(self._orientation)
 
+        Motor._motors.append(self)
         self._log.info('ready.')
 
     # ..............................................................................
     @property
     def velocity(self):
-        return self._velocity
+        '''
+            Returns the velocity measured over the last sample. If no pulse
+            has arrived for longer than that velocity allows, the wheel has
+            since slowed to at most one step over the time since the last
+            pulse, so that bound is returned instead.
+        '''
+        _velocity = self._velocity
+        if _velocity != 0.0:
+            _since_pulse = time.monotonic() - self._last_pulse_time
+            if _since_pulse > 0.0:
+                _bound = 1.0 / ( _since_pulse * self._velocity_fudge_factor )
+                if _bound < abs(_velocity):
+                    return math.copysign(_bound, _velocity)
+        return _velocity
+
+    # ..............................................................................
+    @property
+    def smoothed_velocity(self):
+        '''
+            Returns an exponential moving average of the sampled velocity,
+            for use where the noise of individual samples matters more than
+            the lag of the average.
+        '''
+        return self._velocity_ema
 
     # ..............................................................................
     @property
     def steps(self):
         return self._steps
 
+    # ..............................................................................
+    def snapshot(self):
+        '''
+            Returns a tuple of the step count, velocity and timestamp as of
+            the last velocity sample. These are published together by the
+            encoder callback as a single tuple, so unlike reading the steps
+            and velocity properties in turn they're always consistent.
+        '''
+        return self._snapshot
+
     # ..............................................................................
     def reset_steps(self):
         self._steps = 0
 
     # ..............................................................................
     def set_max_power_ratio(self, max_power_ratio):
+        '''
+            Sets the ratio of motor to battery voltage. The battery voltage
+            at this time is kept as the nominal voltage, against which the
+            driving power is compensated as the battery drains.
+        '''
+        if not max_power_ratio:
+            raise ValueError('max power ratio must be non-zero.')
         self._max_power_ratio = max_power_ratio
+        self._inv_max_power_ratio = 1.0 / max_power_ratio
+        self._v_nominal = self._tb.GetBatteryReading()
+        self._vbus_correction = 1.0
+
+    # ..............................................................................
+    def _update_vbus_correction(self):
+        '''
+            Reads the battery voltage and updates the correction applied to
+            the driving power, so that the same power argument continues to
+            produce the same motor voltage. If either reading is unavailable
+            the previous correction is kept.
+        '''
+        _vbus = self._tb.GetBatteryReading()
+        if self._v_nominal and _vbus:
+            self._vbus_correction = self._v_nominal / _vbus
+            self._log.debug('battery: %5.2fV; nominal: %5.2fV; correction: %5.3f', _vbus, self._v_nominal, self._vbus_correction)
 
     # ..............................................................................
     def get_max_power_ratio(self):
@@ -132,7 +224,7 @@ class Motor():
 
     # ..............................................................................
     def configure_encoder(self, orientation):
-        if self._orientation is Orientation.PORT:
+        if self._is_port:
             ROTARY_ENCODER_A = self._rotary_encoder_a1_port
             ROTARY_ENCODER_B = self._rotary_encoder_b1_port
         elif self._orientation is Orientation.STBD:
@@ -146,26 +238,28 @@ class Motor():
     # ..............................................................................
     def callback_step_count(self, pulse):
         '''
-            This callback is used to capture encoder steps.
-        '''
-        if not self._reverse_encoder_orientation:
-            if self._orientation is Orientation.PORT:
-                self._steps = self._steps + pulse
-            else:
-                self._steps = self._steps - pulse
-        else:
-            if self._orientation is Orientation.PORT:
-                self._steps = self._steps - pulse
-            else:
-                self._steps = self._steps + pulse
-        if self._steps % self._sample_rate == 0:
+            This callback is used to capture encoder steps. It's called from
+            pigpio's callback thread on every encoder pulse, so is kept lean.
+        '''
+        _now = time.monotonic()
+        self._last_pulse_time = _now
+        _steps = self._steps + pulse * self._pulse_sign
+        self._steps = _steps
+        self._pulses_until_sample -= 1
+        if self._pulses_until_sample <= 0:
+            self._pulses_until_sample = self._sample_rate
+            # the sample is timed edge to edge, from the pulse that began it to this one
             if self._steps_begin != 0:
-                self._velocity = ( (self._steps - self._steps_begin) / (time.time() - self._stepcount_timestamp) / self._velocity_fudge_factor ) # steps / duration
-                self._max_velocity = max(self._velocity, self._max_velocity)
-                self._stepcount_timestamp = time.time()
-            self._stepcount_timestamp = time.time()
-            self._steps_begin = self._steps
-        self._log.debug(Fore.BLACK + '{}: {:+d} steps'.format(self._orientation.label, self._steps))
+                _velocity = ( (_steps - self._steps_begin) / (_now - self._stepcount_timestamp) / self._velocity_fudge_factor ) # steps / duration
+                self._velocity = _velocity
+                if _velocity > self._max_velocity:
+                    self._max_velocity = _velocity
+                self._velocity_ema = self._velocity_eta * self._velocity_ema + ( 1.0 - self._velocity_eta ) * _velocity
+                self._snapshot = ( _steps, _velocity, _now )
+            self._stepcount_timestamp = _now
+            self._steps_begin = _steps
+        if self._debug_on:
+            self._log.debug(_STEPS_FORMAT, self._orientation.label, _steps)
 
     # ..............................................................................
     def cruise():
@@ -176,16 +270,73 @@ class Motor():
 
     # ..........................................................................
     def enable(self):
+        '''
+            Starts the power writer thread. While enabled, power commands are
+            handed to the writer, which sends only the latest of any that
+            arrive while it's busy with the I²C bus.
+        '''
+        if self._writer is None:
+            self._writer = threading.Thread(name='motor-writer:{}'.format(self._orientation.label), target=self._power_writer, daemon=True)
+            self._writer.start()
         self._log.info('enabled.')
-        pass
 
     # ..........................................................................
     def disable(self):
+        '''
+            Stops the power writer thread once it has sent any pending power.
+            Power commands are then written directly.
+        '''
+        _writer = self._writer
+        if _writer is not None:
+            self._writer = None
+            self._power_event.set()
+            _writer.join()
         self._log.info('disabled.')
-        pass
+
+    # ..........................................................................
+    def _power_writer(self):
+        '''
+            The writer thread loop: waits for a power command and writes
+            whichever is latest, until disabled.
+        '''
+        _thread = threading.current_thread()
+        while True:
+            self._power_event.wait()
+            self._power_event.clear()
+            with self._power_lock:
+                _power = self._pending_power
+                self._pending_power = None
+                if _power is not None:
+                    self._set_motor(_power)
+            if self._writer is not _thread:
+                break
+
+    # ..........................................................................
+    def _write_power(self, power):
+        '''
+            Commands the motor power, via the writer thread if it's running.
+        '''
+        self._commanded_power = power
+        if self._writer is not None:
+            self._pending_power = power
+            self._power_event.set()
+        else:
+            self._set_motor(power)
+
+    # ..........................................................................
+    def _write_power_now(self, power):
+        '''
+            Writes the motor power immediately, discarding any pending power
+            so that the writer thread can't follow this with a stale value.
+        '''
+        with self._power_lock:
+            self._pending_power = None
+            self._set_motor(power)
+            self._commanded_power = power
 
     # ..........................................................................
     def close(self):
+        self.disable()
         self._log.info('max velocity: {:>5.2f}; max power: {:>5.2f}; max adjusted power: {:>5.2f}.'.format(self._max_velocity, self._max_power, self._max_driving_power))
         self._log.info('closed.')
 
@@ -215,7 +366,15 @@ class Motor():
     def cancel():
         '''
             Stop both motors immediately. This can be called from either motor.
+
+            Each motor is stopped via _write_power_now() so that its writer
+            thread can't follow the stop with a power it had pending.
         '''
+        global TB # as otherwise the assignment below makes it a local
+        if Motor._motors:
+            for _motor in Motor._motors:
+                _motor._write_power_now(0.0)
+            return
         try: TB
         except NameError: TB = None
 
@@ -233,11 +392,7 @@ class Motor():
             Stops the motor immediately.
         '''
         self._log.info('stop.')
-        if self._orientation is Orientation.PORT:
-            self._tb.SetMotor1(0.0)
-        else:
-            self._tb.SetMotor2(0.0)
-        pass
+        self._write_power_now(0.0)
 
     # ..........................................................................
     def halt(self):
@@ -329,6 +484,45 @@ class Motor():
 
         self._log.info(Fore.BLUE + Style.BRIGHT + 'accelerated to velocity {:>5.2f} at power: {:>5.2f}. '.format(velocity, self.get_current_power_level()))
 
+    # ..........................................................................
+    def _accelerate_to_velocity(self, velocity, slew_rate, step_limit):
+        '''
+            Drives the motor to the requested velocity by feedforward. Each
+            loop period the setpoint moves toward the requested velocity by
+            the slew rate and the power needed to reach it from the current
+            velocity is set directly, rather than being searched for.
+        '''
+        _slew = slew_rate.ratio * 100.0 # as velocity approximates a percentage of power
+        _limit = self._motor_power_limit
+        _neg_limit = self._neg_motor_power_limit
+        _setpoint = self.velocity
+        self._update_vbus_correction()
+        self._log.info(Fore.BLUE + Style.BRIGHT + '_accelerate_to_velocity {:>5.2f} @ slew rate: {:>5.2f}; step limit: {:+d}'.format(\
+                velocity, slew_rate.ratio, step_limit))
+        _deadline = time.monotonic()
+        while not self._interrupt and ( step_limit == -1 or self._steps <= step_limit ):
+            _setpoint = min(velocity, _setpoint + _slew) if _setpoint < velocity else max(velocity, _setpoint - _slew)
+            if _setpoint == velocity:
+                # arrived: leave the motor at the steady-state power, kV * velocity,
+                # rather than the transient power of the final step
+                self._apply_motor_power(min(_limit, max(_neg_limit, self.feedforward(velocity, velocity))))
+                break
+            _power = min(_limit, max(_neg_limit, self.feedforward(self.velocity, _setpoint)))
+            self._apply_motor_power(_power)
+            _deadline += self._accel_loop_delay_sec
+            _sleep_sec = _deadline - time.monotonic()
+            if _sleep_sec > 0.0:
+                time.sleep(_sleep_sec)
+
+    # ..........................................................................
+    def feedforward(self, current_velocity, next_velocity):
+        '''
+            Returns the power that takes the motor from the current velocity
+            to the next velocity over one loop delay, from the kV and kA motor
+            constants. At a steady velocity this is simply kV * velocity.
+        '''
+        return self._ff_gain * ( next_velocity - self._ff_a * current_velocity )
+
     # ..........................................................................
     def set_motor_power(self, power_level):
         '''
@@ -341,28 +535,38 @@ class Motor():
         if power_level > self._motor_power_limit:
             self._log.error(Style.BRIGHT + 'motor power too high: {:>5.2f}; limit: {:>5.2f}'.format(power_level, self._motor_power_limit))
             return
-        elif power_level < ( -1.0 * self._motor_power_limit ):
-            self._log.error(Style.BRIGHT + 'motor power too low: {:>5.2f}; limit: {:>5.2f}'.format( power_level,( -1.0 * self._motor_power_limit )))
+        elif power_level < self._neg_motor_power_limit:
+            self._log.error(Style.BRIGHT + 'motor power too low: {:>5.2f}; limit: {:>5.2f}'.format( power_level, self._neg_motor_power_limit))
             return
+        self._apply_motor_power(power_level)
+
+    # ..........................................................................
+    def _apply_motor_power(self, power_level):
+        '''
+            Sets the power level once it's known to be within the motor power
+            limit, refusing any large jump across zero.
+        '''
         _current_power = self.get_current_power_level()
 #       _current_actual_power = _current_power * ( 1.0 / self._max_power_ratio )
-        if abs(_current_power - power_level) > 0.3 and _current_power > 0.0 and power_level < 0:
-            self._log.error('cannot perform positive-negative power jump: {:>5.2f} to {:>5.2f}.'.format(_current_power, power_level))
-            return
-        elif abs(_current_power - power_level) > 0.3 and _current_power < 0.0 and power_level > 0:
-            self._log.error('cannot perform negative-positive power jump: {:>5.2f} to {:>5.2f}.'.format(_current_power, power_level))
-            return
+        _delta = _current_power - power_level
+        _adelta = -_delta if _delta < 0.0 else _delta
+        if _adelta > 0.3:
+            if _current_power > 0.0 and power_level < 0:
+                self._log.error('cannot perform positive-negative power jump: {:>5.2f} to {:>5.2f}.'.format(_current_power, power_level))
+                return
+            elif _current_power < 0.0 and power_level > 0:
+                self._log.error('cannot perform negative-positive power jump: {:>5.2f} to {:>5.2f}.'.format(_current_power, power_level))
+                return
 
         # okay, let's go .........................
-        _driving_power = float(power_level * self._max_power_ratio)
-        self._max_power = max(power_level, self._max_power)
-        self._max_driving_power = max(abs(_driving_power), self._max_driving_power)
-        self._log.debug(Fore.MAGENTA + Style.BRIGHT + 'power argument: {:>5.2f}'.format(power_level) + Style.NORMAL \
-                + '\tcurrent power: {:>5.2f}; driving power: {:>5.2f}.'.format(_current_power, _driving_power))
-        if self._orientation is Orientation.PORT:
-            self._tb.SetMotor1(_driving_power)
-        else:
-            self._tb.SetMotor2(_driving_power)
+        _driving_power = power_level * self._max_power_ratio * self._vbus_correction
+        if power_level > self._max_power:
+            self._max_power = power_level
+        _abs_driving_power = -_driving_power if _driving_power < 0.0 else _driving_power
+        if _abs_driving_power > self._max_driving_power:
+            self._max_driving_power = _abs_driving_power
+        self._log.debug(_POWER_FORMAT, power_level, _current_power, _driving_power)
+        self._write_power(_driving_power)
 
     # ..........................................................................
     @property
@@ -381,21 +585,25 @@ class Motor():
 
     # ................................
     def get_current_power_level(self):
+        '''
+            Returns the power level last written to the motor. As this class
+            is the only writer of motor power there's no need to ask the
+            ThunderBorg; use read_motor_power() for that.
+        '''
+        return self._commanded_power
+
+    # ................................
+    def read_motor_power(self):
         '''
             Makes a best attempt at getting the power level value from the motors.
+            This is an I²C query of the ThunderBorg, taking up to 100ms.
         '''
         value = None
         count = 0
-        if self._orientation is Orientation.PORT:
-            while value == None and count < 20:
-                count += 1
-                value = self._tb.GetMotor1()
-                time.sleep(0.005)
-        else:
-            while value == None and count < 20:
-                count += 1
-                value = self._tb.GetMotor2()
-                time.sleep(0.005)
+        while value == None and count < 20:
+            count += 1
+            value = self._get_motor()
+            time.sleep(0.005)
         if value == None:
             return 0.0
         else:
@@ -412,43 +620,51 @@ class Motor():
             If steps > 0 then run until the number of steps has been reached.
         '''
         self._interrupt = False
-        _current_power_level = self.get_current_power_level()
-        if _current_power_level is None:
-            raise RuntimeError('cannot continue: unable to read current power from motor.')
-        self._log.info('current power: {:>5.2f} max power ratio: {:>5.2f}...'.format(_current_power_level, self._max_power_ratio))
-        _current_power_level = _current_power_level * ( 1.0 / self._max_power_ratio )
+        _commanded_power = self._commanded_power
+        _current_power_level = _commanded_power * self._inv_max_power_ratio
+        _desired_div_100 = speed / 100.0
+        if abs(_current_power_level - _desired_div_100) < 1e-6: # no change, e.g., ahead(0) when already stopped
+            self._log.info('already at acceleration power of {:>5.2f}, exiting.'.format(_current_power_level) )
+            return
 
         # accelerate to desired speed
-        _desired_div_100 = float(speed / 100)
+        self._log.info('current power: {:>5.2f} max power ratio: {:>5.2f}...'.format(_commanded_power, self._max_power_ratio))
         self._log.info('accelerating from {:>5.2f} to {:>5.2f}...'.format(_current_power_level, _desired_div_100))
 
-        if _current_power_level == _desired_div_100: # no change
-            self._log.warning('already at acceleration power of {:>5.2f}, exiting.'.format(_current_power_level) )
-            return
-        elif _current_power_level < _desired_div_100: # moving ahead
+        if _current_power_level < _desired_div_100: # moving ahead
             _slew_rate_ratio = slew_rate.ratio
             overstep = 0.001
         else: # moving astern
             _slew_rate_ratio = -1.0 * slew_rate.ratio
             overstep = -0.001
+        self._update_vbus_correction()
 
 #       self._log.warning(Style.BRIGHT + 'LOOP from {:>5.2f} to limit: {:>5.2f} with slew: {:>5.2f}'.format(_current_power_level, (_desired_div_100 + overstep), _slew_rate_ratio))
 
         driving_power_level = 0.0
-        for step_power in numpy.arange(_current_power_level, (_desired_div_100 + overstep), _slew_rate_ratio):
-            driving_power_level = float( step_power * self._max_power_ratio )
-            self.set_motor_power(driving_power_level)
+        # the ramp is the same steps as numpy.arange(current, desired + overstep, ratio),
+        # clipped to the motor power limit up front so each step needn't be checked
+        _step_count = max(0, math.ceil(( _desired_div_100 + overstep - _current_power_level ) / _slew_rate_ratio))
+        _limit = self._motor_power_limit
+        _neg_limit = self._neg_motor_power_limit
+        _ramp = [ min(_limit, max(_neg_limit, ( _current_power_level + _step * _slew_rate_ratio ) * self._max_power_ratio)) \
+                for _step in range(_step_count) ]
+        # each step is scheduled against a deadline so that the time spent
+        # setting the power isn't added to the loop delay
+        _deadline = time.monotonic()
+        for driving_power_level in _ramp:
+            self._apply_motor_power(driving_power_level)
             if self._interrupt:
                 break
-            time.sleep(self._accel_loop_delay_sec)
+            _deadline += self._accel_loop_delay_sec
+            _sleep_sec = _deadline - time.monotonic()
+            if _sleep_sec > 0.0:
+                time.sleep(_sleep_sec)
 
         # be sure we're powered off
         if speed == 0.0 and abs(driving_power_level) > 0.00001:
             self._log.warning('non-zero power level: {:7.5f}v; stopping completely...'.format(driving_power_level))
-            if self._orientation is Orientation.PORT:
-                self._tb.SetMotor1(0.0)
-            else:
-                self._tb.SetMotor2(0.0)
+            self._write_power_now(0.0)
 
         self._log.debug('accelerate complete.')
 
@@ -99,7 +99,7 @@ class Motors():
 
     # ..........................................................................
     def set_led_color(self, color):
-        self._tb.SetLed1(color.red/255.0, color.green/255.0, color.blue/255.0)
+        self._tb.SetLed1(*color.unit_rgb)
 
     # ..........................................................................
     def _set_max_power_ratio(self):
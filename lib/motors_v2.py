@@ -99,7 +99,7 @@ class Motors():
 
     # ..........................................................................
     def set_led_color(self, color):
-        self._tb.SetLed1(color.red/255.0, color.green/255.0, color.blue/255.0)
+        self._tb.SetLed1(*color.unit_rgb)
 
     # ..........................................................................
     def _set_max_power_ratio(self):
@@ -136,6 +136,8 @@ class Motors():
 
     # ..........................................................................
     def enable(self):
+        self._port_motor.enable()
+        self._stbd_motor.enable()
         self._enabled = True
     # ..........................................................................
     def disable(self):
@@ -147,6 +149,8 @@ class Motors():
         if self.is_in_motion(): # if we're moving then halt
             self._log.warning('event: motors are in motion (halting).')
             self.halt()
+        self._port_motor.disable()
+        self._stbd_motor.disable()
         self._log.info('motors disabled.')
 
     # ..........................................................................
@@ -45,6 +45,16 @@ from lib.logger import Level, Logger
 from lib.message import Message
 from lib.convert import Convert
 from lib.rate import Rate
+from lib.orientation import get_orientation
+
+# the FXOS8700 accelerometer range (in g) -> ( driver setting, scale in g per LSB )
+_ACCEL_RANGES = {
+    2: ( adafruit_fxos8700.ACCEL_RANGE_2G, 0.000244 ),
+    4: ( adafruit_fxos8700.ACCEL_RANGE_4G, 0.000488 ),
+    8: ( adafruit_fxos8700.ACCEL_RANGE_8G, 0.000976 )
+}
+_STANDARD_GRAVITY = 9.80665 # m/s²
+_MAG_SCALE        = 0.1     # μT per LSB
 
 # ..............................................................................
 class NXP9DoF:
@@ -109,6 +119,11 @@ class NXP9DoF:
         _config = self._config['ros'].get('nxp9dof')
         self._quaternion_accept = _config.get('quaternion_accept') # permit Quaternion once calibrated
         self._loop_delay_sec = _config.get('loop_delay_sec')
+        _accel_range_g = _config.get('accel_range_g', 2)
+        if _accel_range_g not in _ACCEL_RANGES:
+            raise ValueError('unsupported accelerometer range: {}g (expected 2, 4 or 8).'.format(_accel_range_g))
+        _accel_range, _g_per_lsb = _ACCEL_RANGES[_accel_range_g]
+        self._accel_scale = _g_per_lsb * _STANDARD_GRAVITY # m/s² per LSB
 
         # verbose will print some start-up info on the IMU sensors
         self._imu = IMU(gs=4, dps=2000, verbose=True)
@@ -117,10 +132,13 @@ class NXP9DoF:
 #       self._imu.setBias((0.1,-0.02,.25), None, None)
 
         _i2c = busio.I2C(board.SCL, board.SDA)
-        self._fxos = adafruit_fxos8700.FXOS8700(_i2c)
+        # this is configured after the IMU (which shares the chip) so its range is the one in effect
+        self._fxos = adafruit_fxos8700.FXOS8700(_i2c, accel_range=_accel_range)
         self._log.info('accelerometer and magnetometer ready.')
         self._fxas = adafruit_fxas21002c.FXAS21002C(_i2c)
         self._log.info('gyroscope ready.')
+        # compile (or load from cache) the orientation function ahead of the first reading
+        get_orientation(0.0, 0.0, 1.0, 1.0, 0.0, 0.0)
 
         self._thread  = None
         self._enabled = False
@@ -143,6 +161,19 @@ class NXP9DoF:
     def get_fxas(self):
         return self._fxas
 
+    # ..........................................................................
+    def read_accel_mag(self):
+        '''
+            Returns the accelerometer (m/s²) and magnetometer (μT) axes as
+            a pair of tuples. The FXOS8700 driver's accelerometer and
+            magnetometer properties each read both sensors then discard
+            one, so this reads them once for the two.
+        '''
+        _accel, _mag = self._fxos.read_raw_accel_mag()
+        _scale = self._accel_scale
+        return ( _accel[0] * _scale, _accel[1] * _scale, _accel[2] * _scale ), \
+               ( _mag[0] * _MAG_SCALE, _mag[1] * _MAG_SCALE, _mag[2] * _MAG_SCALE )
+
     # ..........................................................................
     def enable(self):
         if not self._closed:
@@ -222,23 +253,17 @@ class NXP9DoF:
         while not self._closed:
             if self._enabled:
 
-                accel_x, accel_y, accel_z = self._fxos.accelerometer # m/s^2
+                ( accel_x, accel_y, accel_z ), ( mag_x, mag_y, mag_z ) = self.read_accel_mag() # m/s^2, uTesla
                 gyro_x, gyro_y, gyro_z    = self._fxas.gyroscope # radians/s
-                a, m, g = self._imu.get()
-                mag_x, mag_y, mag_z       = self._fxos.magnetometer # uTesla
 
-                mag_x_g = m[0] * 100.0
-                mag_y_g = m[1] * 100.0
-                mag_z_g = m[2] * 100.0
+                mag_x_g = mag_x * 100.0
+                mag_y_g = mag_y * 100.0
+                mag_z_g = mag_z * 100.0
 
 #               rate_gyro_x_dps = Convert.rps_to_dps(gyro_x)
 #               rate_gyro_y_dps = Convert.rps_to_dps(gyro_y)
 #               rate_gyro_z_dps = Convert.rps_to_dps(gyro_z)
 
-#               mag_x_g = mag_x * 100.0
-#               mag_y_g = mag_y * 100.0
-#               mag_z_g = mag_z * 100.0
-
                 heading = 180.0 * math.atan2(mag_y_g,mag_x_g)/math.pi
 
                 print(Fore.CYAN + '| x{:>6.3f} y{:>6.3f} z{:>6.3f} |'.format( mag_x_g, mag_y_g, mag_z_g) \
@@ -323,7 +348,7 @@ class NXP9DoF:
                 print(Fore.CYAN + ('-'*header) + Style.RESET_ALL)
                 for _ in range(10):
                     a, m, g = self._imu.get()
-                    r, p, h = self._imu.getOrientation(a, m)
+                    r, p, h = get_orientation(a[0], a[1], a[2], m[0], m[1], m[2])
                     deg = Convert.to_degrees(h)
 #                   self._log.info(Fore.GREEN + '| {:>6.1f} {:>6.1f} {:>6.1f} | {:>6.1f} {:>6.1f} {:>6.1f} |'.format(a[0], a[1], a[2], r, p, h) + Style.RESET_ALL)
                     print(Fore.CYAN        + '| {:>5.2f} {:>5.2f} {:>5.2f} '.format(a[0], a[1], a[2]) 
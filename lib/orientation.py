@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 by Murray Altheim. All rights reserved. This file is part of
+# the Robot OS project and is released under the "Apache Licence, Version 2.0".
+# Please see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2020-10-15
+#
+#  The tilt-compensated compass of the nxp-imu IMU.getOrientation(), as a
+#  function of scalars so that it may be compiled by numba if installed.
+#
+
+from math import sqrt, atan2, pi
+
+from lib.jit import njit
+
+# ..............................................................................
+@njit(cache=True)
+def get_orientation(ax, ay, az, mx, my, mz):
+    '''
+        Returns the roll, pitch and heading (in radians, the heading from 0
+        to 2π) from the accelerometer and magnetometer axes, per AN4248
+        equations 13, 15 and 22.
+    '''
+    # each angle is an atan2 of two terms with a common positive factor, so
+    # neither vector needs to be normalised: scaling the magnetometer doesn't
+    # change the heading, and the gravity vector's magnitude is folded into
+    # the heading's terms (both multiplied through by |a| * |(ay,az)|)
+    ryz2 = ay * ay + az * az
+    r2 = ax * ax + ryz2
+    if r2 == 0.0:
+        raise ValueError('division by zero: zero-length accelerometer vector.')
+    if mx == 0.0 and my == 0.0 and mz == 0.0:
+        raise ValueError('division by zero: zero-length magnetometer vector.')
+    ryz = sqrt(ryz2)
+    roll = atan2(ay, az)
+    pitch = atan2(-ax, ryz)
+    if ryz > 0.0:
+        heading = atan2(( mz * ay - my * az ) * sqrt(r2), mx * ryz2 - ax * ( my * ay + mz * az ))
+    else: # gravity along x: as atan2(0,0) gives a roll of zero
+        heading = atan2(-my, -mz * ax / sqrt(r2))
+    heading %= 2.0 * pi
+    return roll, pitch, heading
+
+#EOF
@@ -10,16 +10,12 @@
 # modified: 2020-04-21
 #
 
-import sys, time, threading, itertools, math
+import sys, time, threading, math
+from array import array
 from collections import deque
 from colorama import init, Fore, Style
 init()
 
-try:
-    import numpy
-except ImportError:
-    exit("This script requires the numpy module\nInstall with: sudo pip install numpy")
-
 from lib.logger import Level, Logger
 from lib.enums import Direction, Orientation, Speed
 from lib.velocity import Velocity
@@ -27,6 +23,48 @@ from lib.filewriter import FileWriter
 from lib.slew import SlewRate, SlewLimiter
 from lib.rate import Rate
 from lib.pot import Potentiometer
+from lib.jit import njit
+
+# the number of recent errors summed for the integral term (a power of 2)
+_ERROR_HISTORY = 32
+
+# the row format of the odometry data file
+_ODOMETRY_FORMAT = '%5.3f\t%5.2f\t%5.2f\t%5.2f\t%d\n'
+
+# ..............................................................................
+@njit(cache=True)
+def _pid_core(error, sum_errors, last_error, kp, ki, kd, clip_min, clip_max):
+    '''
+        The arithmetic of a PID step, compiled by numba if it's available.
+        Returns the P, I and D terms and their sum clipped to the limits.
+    '''
+    p_diff = kp * error
+    i_diff = ki * sum_errors
+    d_diff = kd * last_error
+    output = p_diff + i_diff + d_diff
+    if output > clip_max:
+        output = clip_max
+    elif output < clip_min:
+        output = clip_min
+    return p_diff, i_diff, d_diff, output
+
+# ..............................................................................
+@njit(cache=True)
+def _pid_incremental_core(error, last_error, second_last_error, kp, ki, kd, clip_min, clip_max):
+    '''
+        The arithmetic of an incremental (velocity form) PID step, compiled
+        by numba if it's available. Returns the P, I and D contributions and
+        their sum, the change in output, clipped to the limits.
+    '''
+    p_diff = kp * ( error - last_error )
+    i_diff = ki * error
+    d_diff = kd * ( error - 2.0 * last_error + second_last_error )
+    output = p_diff + i_diff + d_diff
+    if output > clip_max:
+        output = clip_max
+    elif output < clip_min:
+        output = clip_min
+    return p_diff, i_diff, d_diff, output
 
 # _current_power = lambda: _motor.get_current_power_level()
 # _set_power = lambda p: _motor.set_motor_power(p)
@@ -49,6 +87,7 @@ class PID():
         self._motor = motor
         self._orientation = motor.get_orientation()
         self._log = Logger('pid:{}'.format(self._orientation.label), level)
+        self._debug = self._log.is_enabled_for(Level.DEBUG) # gates debug formatting on each loop
 
         # PID configuration ................................
         if config is None:
@@ -63,9 +102,8 @@ class PID():
         self._wheelbase      = _geo_config.get('wheelbase')
         self._step_per_rotation = _geo_config.get('steps_per_rotation')
 
-        _clip_max = _config.get('clip_limit')
-        _clip_min = -1.0 * _clip_max
-        self._clip   = lambda n: _clip_min if n <= _clip_min else _clip_max if n >= _clip_max else n
+        self._clip_max = _config.get('clip_limit')
+        self._clip_min = -1.0 * self._clip_max
         self._enable_p = _config.get('enable_p')
         self._enable_i = _config.get('enable_i')
         self._enable_d = _config.get('enable_d')
@@ -73,6 +111,8 @@ class PID():
         _ki = _config.get('ki')
         _kd = _config.get('kd')
         self.set_tuning(_kp, _ki, _kd)
+        # if True use the incremental (velocity) form, whose gains are tuned differently
+        self._incremental = _config.get('incremental', False)
 
         self._read_p_from_pot = _config.get('read_p_from_pot')
         self._read_i_from_pot = _config.get('read_i_from_pot')
@@ -96,11 +136,17 @@ class PID():
 
         self._rate = Rate(_config.get('sample_freq_hz'), level) # default sample rate is 20Hz
 #       self._millis  = lambda: int(round(time.time() * 1000))
-        self._counter = itertools.count()
+        self._loop_count = -1
         self._last_error = 0.0
-        self._sum_errors = 0.0
+        self._second_last_error = 0.0
+        self._sum_errors = 0.0   # the sum of the errors in the history
+        self._sum_errors_c = 0.0 # the Kahan compensation of that sum
+        self._error_history = array('d', [0.0]) * _ERROR_HISTORY # ring buffer of recent errors
+        self._error_index = 0
         self._step_limit = 0
         self._stats_queue = None
+        self._odometry = None    # columns of odometry data, written on close
+        self._odometry_decimate = _config.get('odometry_decimate', 1) # capture every nth loop
         self._filewriter = None  # optional: for statistics
         self._filewriter_closed = False
 
@@ -125,8 +171,19 @@ class PID():
         self._kp = p
         self._ki = i
         self._kd = d
+        self._set_effective_gains()
         self._log.info('set PID tuning for {} motor: P={:>8.5f}; I={:>8.5f}; D={:>8.5f}.'.format(self._orientation.name, self._kp, self._ki, self._kd))
 
+    # ..........................................................................
+    def _set_effective_gains(self):
+        '''
+            Folds the enable_p/i/d flags into the gains used by _compute(),
+            a disabled term having a gain of zero.
+        '''
+        self._kp_eff = self._kp if self._enable_p else 0.0
+        self._ki_eff = self._ki if self._enable_i else 0.0
+        self._kd_eff = self._kd if self._enable_d else 0.0
+
     # ..........................................................................
     def get_tuning(self):
         return [ self._kp, self._ki, self._kd ]
@@ -160,20 +217,34 @@ class PID():
         self._motor.reset_steps()
 
     # ..........................................................................
-    def is_stepping(self, direction):
+    def is_stepping(self, direction, steps=None):
         '''
             Returns True if the motor step count is less than the currently-set 
             step limit, or if traveling in REVERSE, greater than the step limit.
+
+            If the step count has already been read it may be provided as
+            the steps argument, otherwise it's read from the motor.
         '''
+        if steps is None:
+            steps = self.get_steps()
 #       while f_is_enabled() and (( direction is Direction.FORWARD and self.get_steps() < _step_limit ) or \
 #                                 ( direction is Direction.REVERSE and self.get_steps() > _step_limit )):
 #       return ( self.get_steps() < self._step_limit ) if direction is Direction.FORWARD else ( self.get_steps() > self._step_limit )
+        if self._debug:
+            self._log.debug(Fore.MAGENTA + '{} is stepping {}? {:>5.2f} of {:>5.2f}'.format(self._orientation, direction, steps, self._step_limit ))
+        return PID._direction_sign(direction) * ( steps - self._step_limit ) < 0
+
+    # ..........................................................................
+    @staticmethod
+    def _direction_sign(direction):
+        '''
+            Returns 1 for FORWARD and -1 for REVERSE, the sign of the step
+            count and velocity when traveling in that direction.
+        '''
         if direction is Direction.FORWARD:
-            self._log.debug(Fore.MAGENTA + '{} is stepping forward? {:>5.2f} < {:>5.2f}'.format(self._orientation, self.get_steps(), self._step_limit ))
-            return ( self.get_steps() < self._step_limit )
+            return 1
         elif direction is Direction.REVERSE:
-            self._log.debug(Fore.MAGENTA + '{} is stepping reverse? {:>5.2f} > {:>5.2f}'.format(self._orientation, self.get_steps(), self._step_limit ))
-            return ( self.get_steps() > self._step_limit )
+            return -1
         else:
             raise Exception('no direction provided.')
 
@@ -219,14 +290,17 @@ class PID():
 
             if self._read_p_from_pot:
                 self._kp = self._pot.get_scaled_value()
+                self._set_effective_gains()
                 self._log.info(Fore.BLUE + 'P={:>10.7f};'.format(self._kp) + Fore.BLACK + ' I={:>10.7f};'.format(self._ki) + Fore.BLACK + ' D={:>10.7f};'.format(self._kd)
                         + Fore.GREEN + Style.BRIGHT + ' velocity: {:>5.2f}/{:>5.2f}'.format(self._motor.get_velocity(), self._target_velocity) )
             elif self._read_i_from_pot:
                 self._ki = self._pot.get_scaled_value()
+                self._set_effective_gains()
                 self._log.info(Fore.BLACK + 'P={:>10.7f};'.format(self._kp) + Fore.BLUE + ' I={:>10.7f};'.format(self._ki) + Fore.BLACK + ' D={:>10.7f};'.format(self._kd)
                         + Fore.GREEN + Style.BRIGHT + ' velocity: {:>5.2f}/{:>5.2f}'.format(self._motor.get_velocity(), self._target_velocity) )
             elif self._read_d_from_pot:
                 self._kd = self._pot.get_scaled_value()
+                self._set_effective_gains()
                 self._log.info(Fore.BLACK + 'P={:>10.7f};'.format(self._kp) + Fore.BLACK + ' I={:>10.7f};'.format(self._ki) + Fore.BLUE + ' D={:>10.7f};'.format(self._kd)
                         + Fore.GREEN + Style.BRIGHT + ' velocity: {:>5.2f}/{:>5.2f}'.format(self._motor.get_velocity(), self._target_velocity) )
             else:
@@ -237,7 +311,8 @@ class PID():
 
             self._max_diff_steps = max(self._max_diff_steps, _diff_steps)
 #           time.sleep(0.04)
-            self._log.debug('PID loop; diff steps: {:d}'.format(_diff_steps))
+            if self._debug:
+                self._log.debug('PID loop; diff steps: {:d}'.format(_diff_steps))
 
             # TODO figure out how many ticks per loop is required for a given velocity
 
@@ -278,73 +353,60 @@ class PID():
         else:
             print(Fore.GREEN + 'slew disabled; f_is_enabled? {}'.format(f_is_enabled()) + Style.RESET_ALL)
 
-        if direction is Direction.FORWARD: # .......................................................
-
-            _is_accelerating = self._motor.get_velocity() < _target_velocity
-            self._log.info(Fore.GREEN + Style.BRIGHT + 'current velocity: {};'.format(self._motor.get_velocity()) \
-                    + Fore.CYAN + Style.NORMAL + ' target velocity: {}; step limit: {}; is_accelerating: {}.'.format(_target_velocity, self._step_limit, _is_accelerating))
-
-            while f_is_enabled() and self.is_stepping(direction): # or ( direction is Direction.REVERSE and self.get_steps() > self._step_limit )):
-                if self._enable_slew:
-                    _slewed_target_velocity = self._slewlimiter.slew(self._motor.get_velocity(), _target_velocity)
-                    _changed = self._compute(_slewed_target_velocity)
-                else:
-                    _changed = self._compute(_target_velocity)
-    
-                self._log.debug(Fore.BLACK + Style.DIM + '{:d}/{:d} steps.'.format(self.get_steps(), self._step_limit))
-                if not _changed and self._motor.get_velocity() == 0.0 and _target_velocity == 0.0 and self._step_limit > 0: # we will never get there if we aren't moving
-                    self._log.info(Fore.RED + 'break 2.')
-                    break
-    
-                # displays info only:
-                if _is_accelerating and self._motor.get_velocity() >= _target_velocity:
-                    _elapsed = time.time() - self._start_time
-                    _is_accelerating = False
-                    self._log.info(Fore.GREEN + Style.BRIGHT + 'reached target velocity of {:+06.2f} at {:5.2f} sec elapsed.'.format(_target_velocity, _elapsed))
-    
-                self._rate.wait() # 20Hz
-
-                if self._motor.is_interrupted():
-                    self._log.info(Fore.RED + 'motor interrupted.')
-                    break
-
-                if self._orientation is Orientation.PORT:
-                    self._log.info(Fore.RED + 'current velocity: {:>5.2f};'.format(self._motor.get_velocity() ) \
-                            + Fore.CYAN + ' target velocity: {}; {:d} steps of: {}; is_accelerating: {}.'.format(_target_velocity, self.get_steps(), self._step_limit, _is_accelerating))
-                else:
-                    self._log.info(Fore.GREEN + 'current velocity: {:>5.2f};'.format(self._motor.get_velocity() ) \
-                            + Fore.CYAN + ' target velocity: {}; {:d} steps of: {}; is_accelerating: {}.'.format(_target_velocity, self.get_steps(), self._step_limit, _is_accelerating))
-
-        elif direction is Direction.REVERSE: # .....................................................
-
-            _target_velocity = -1.0 * _target_velocity
-            _is_accelerating = self._motor.get_velocity() < _target_velocity
-            self._log.info(Fore.RED + Style.BRIGHT + 'target velocity: {}; step limit: {}; is_accelerating: {}.'.format(_target_velocity, self._step_limit, _is_accelerating))
-
-            while f_is_enabled() and self.is_stepping(direction): # or ( direction is Direction.REVERSE and self.get_steps() > self._step_limit )):
-                if self._enable_slew:
-                    _slewed_target_velocity = self._slewlimiter.slew(self._motor.get_velocity(), _target_velocity)
-                    _changed = self._compute(_slewed_target_velocity)
-                else:
-                    _changed = self._compute(_target_velocity)
-    
-                self._log.debug(Fore.BLACK + Style.DIM + '{:d}/{:d} steps.'.format(self.get_steps(), self._step_limit))
-                if not _changed and self._motor.get_velocity() == 0.0 and _target_velocity == 0.0 and self._step_limit > 0: # we will never get there if we aren't moving
-                    break
-    
-                # displays info only:
-                if _is_accelerating and self._motor.get_velocity() >= _target_velocity:
-                    _elapsed = time.time() - self._start_time
-                    _is_accelerating = False
-                    self._log.info(Fore.GREEN + Style.BRIGHT + 'reached target velocity of {:+06.2f} at {:5.2f} sec elapsed.'.format(_target_velocity, _elapsed))
-    
-                self._rate.wait() # 20Hz
-
-                if self._motor.is_interrupted():
-                    break
-
-        else: # ....................................................................................
-            raise Exception('no direction provided.')
+        # the loop is the same in either direction, with the target velocity
+        # and the step limit test taking the sign of the direction
+        _sign = PID._direction_sign(direction)
+        _target_velocity = _sign * _target_velocity
+        _step_limit = self._step_limit
+        _color = Fore.RED if self._orientation is Orientation.PORT else Fore.GREEN
+        _compute = self._compute
+        _slew = self._slewlimiter.slew if self._enable_slew else None
+        _motor = self._motor
+        # each loop is scheduled against an absolute deadline, so that the
+        # time spent in the loop doesn't accumulate as drift
+        _period = self._rate.get_period_sec()
+        _deadline = time.perf_counter() + _period
+
+        _is_accelerating = _motor.get_velocity() < _target_velocity
+        self._log.info(Fore.GREEN + Style.BRIGHT + 'current velocity: {};'.format(_motor.get_velocity()) \
+                + Fore.CYAN + Style.NORMAL + ' target velocity: {}; step limit: {}; is_accelerating: {}.'.format(_target_velocity, _step_limit, _is_accelerating))
+
+        while f_is_enabled():
+            # the motor's velocity and steps are read once per loop
+            _velocity = _motor.get_velocity()
+            _steps = _motor.get_steps()
+            if _sign * ( _steps - _step_limit ) >= 0: # reached the step limit
+                break
+            if _slew:
+                _changed = _compute(_slew(_velocity, _target_velocity), _velocity)
+            else:
+                _changed = _compute(_target_velocity, _velocity)
+
+            if self._debug:
+                self._log.debug(Fore.BLACK + Style.DIM + '{:d}/{:d} steps.'.format(_steps, _step_limit))
+            if not _changed and _velocity == 0.0 and _target_velocity == 0.0 and _step_limit > 0: # we will never get there if we aren't moving
+                self._log.info(Fore.RED + 'break 2.')
+                break
+
+            # displays info only:
+            if _is_accelerating and _velocity >= _target_velocity:
+                _elapsed = time.time() - self._start_time
+                _is_accelerating = False
+                self._log.info(Fore.GREEN + Style.BRIGHT + 'reached target velocity of {:+06.2f} at {:5.2f} sec elapsed.'.format(_target_velocity, _elapsed))
+
+            _sleep_sec = _deadline - time.perf_counter()
+            if _sleep_sec > 0.0:
+                time.sleep(_sleep_sec)
+                _deadline += _period
+            else: # overran the period: resynchronise rather than try to catch up
+                _deadline = time.perf_counter() + _period
+
+            if _motor.is_interrupted():
+                self._log.info(Fore.RED + 'motor interrupted.')
+                break
+
+            self._log.info(_color + 'current velocity: {:>5.2f};'.format(_velocity) \
+                    + Fore.CYAN + ' target velocity: {}; {:d} steps of: {}; is_accelerating: {}.'.format(_target_velocity, _steps, _step_limit, _is_accelerating))
 
         _elapsed = time.time() - self._start_time
         self._elapsed_sec = int(round(_elapsed)) + 1
@@ -354,16 +416,18 @@ class PID():
         self._motor.reset_interrupt()
 
     # ..........................................................................
-    def _compute(self, target_velocity):
+    def _compute(self, target_velocity, current_velocity=None):
         '''
-            The PID power compute function, called upon each loop.
+            The PID power compute function, called upon each loop. If the
+            motor velocity has already been read this loop it may be provided
+            as current_velocity, otherwise it's read from the motor.
 
             Returns True if PID computed a change, False if the error was zero and no change was applied.
         '''
-        self._loop_count = next(self._counter)
+        self._loop_count += 1
 
         # compare current and target velocities ............................
-        _current_velocity = self._motor.get_velocity()
+        _current_velocity = self._motor.get_velocity() if current_velocity is None else current_velocity
         _error = target_velocity - _current_velocity
 #       if _current_velocity == 0:
 #           self._log.debug(Fore.CYAN + Style.NORMAL + '[{:0d}]; velocity: {:+06.2f} ➔ {:+06.2f}\t _error: {:>5.2f}.'.format(self._loop_count, _current_velocity, target_velocity, _error))
@@ -381,40 +445,37 @@ class PID():
                 self._log.info(Fore.WHITE + Style.BRIGHT + '[{:02d}]+ no error, currently at target velocity:  {:+06.2f}; at power: {:+5.3f}'.format(\
                         self._loop_count, _current_velocity, _current_power))
             # remember some variables for next time ........................
-            self._last_error = 0.0
+            self._second_last_error = self._last_error
+            # the incremental form's differences need the real error
+            self._last_error = _error if self._incremental else 0.0
             _changed = False
 
         else:
 
-            # P: Proportional ..............................................
-            if self._enable_p:
-                _p_diff = self._kp * _error
-                self._log.debug(Fore.BLUE + Style.BRIGHT + 'P diff: {:>5.4f}'.format(_p_diff) + Style.NORMAL + ' = self._kp: {:>5.4f} * _error: {:>5.4f}.'.format(self._kp, _error))
-            else:
-                _p_diff = 0.0
-
-            # I: Integral ..................................................
-            if self._enable_i:
-                _i_diff = self._ki * self._sum_errors if self._enable_i else 0.0
-                self._log.debug(Fore.MAGENTA + Style.BRIGHT + 'I diff: {:45.4f}'.format(_i_diff) + Style.NORMAL \
-                        + ' = self._ki: {:>5.4f} * _sum_errors: {:>5.4f}.'.format(self._ki, self._sum_errors))
+            # P: Proportional, I: Integral, D: Derivative, clipped output ..
+            # (a disabled term has an effective gain of zero)
+            if not self._incremental:
+                _p_diff, _i_diff, _d_diff, _clipped_output = _pid_core(_error, self._sum_errors, self._last_error, \
+                        self._kp_eff, self._ki_eff, self._kd_eff, self._clip_min, self._clip_max)
+                if self._debug:
+                    self._log.debug(Fore.BLUE + Style.BRIGHT + 'P diff: {:>5.4f}'.format(_p_diff) + Style.NORMAL + ' = kp: {:>5.4f} * _error: {:>5.4f}.'.format(self._kp_eff, _error))
+                    self._log.debug(Fore.MAGENTA + Style.BRIGHT + 'I diff: {:>5.4f}'.format(_i_diff) + Style.NORMAL \
+                            + ' = ki: {:>5.4f} * _sum_errors: {:>5.4f}.'.format(self._ki_eff, self._sum_errors))
+                    self._log.debug(Fore.YELLOW + 'D diff: {:>5.4f}'.format(_d_diff) + Style.NORMAL + ' = kd: {:>5.4f} * _last_error: {:>5.4f}.'.format(self._kd_eff, self._last_error))
             else:
-                _i_diff = 0.0
+                # the incremental form: the output is a change to the current
+                # power, so there's no integral sum to wind up
+                _p_diff, _i_diff, _d_diff, _clipped_output = _pid_incremental_core(_error, self._last_error, self._second_last_error, \
+                        self._kp_eff, self._ki_eff, self._kd_eff, self._clip_min, self._clip_max)
+                if self._debug:
+                    self._log.debug(Fore.BLUE + Style.BRIGHT + 'P diff: {:>5.4f}'.format(_p_diff) + Style.NORMAL \
+                            + ' = kp: {:>5.4f} * (_error: {:>5.4f} - _last_error: {:>5.4f}).'.format(self._kp_eff, _error, self._last_error))
+                    self._log.debug(Fore.MAGENTA + Style.BRIGHT + 'I diff: {:>5.4f}'.format(_i_diff) + Style.NORMAL + ' = ki: {:>5.4f} * _error: {:>5.4f}.'.format(self._ki_eff, _error))
+                    self._log.debug(Fore.YELLOW + 'D diff: {:>5.4f}'.format(_d_diff) + Style.NORMAL \
+                            + ' = kd: {:>5.4f} * second difference of errors: {:>5.4f}.'.format(self._kd_eff, _error - 2.0 * self._last_error + self._second_last_error))
 
-            # D: Derivative ................................................
-            if self._enable_d:
-                _d_diff = self._kd * self._last_error if self._enable_d else 0.0
-                self._log.debug(Fore.YELLOW + 'D diff: {:>5.4f}'.format(_d_diff) + Style.NORMAL + ' = self._kd: {:>5.4f} * _last_error: {:>5.4f}.'.format(self._kd, self._last_error))
-            else:
-                _d_diff = 0.0
-
-            # calculate output .............................................
-            _output = _p_diff + _i_diff + _d_diff
     #       self._log.debug(Fore.CYAN + Style.BRIGHT + '_output: {:>5.4f}'.format(_output) + Style.NORMAL + ' = (P={:+5.4f}) + (I={:+5.4f}) + (D={:+5.4f})'.format(_p_diff, _i_diff, _d_diff))
 
-            # clipping .....................................................
-            _clipped_output = self._clip(_output)
-
             # set motor power ..............................................
             _power_level = _current_power + _clipped_output
 #           if abs(_output) <= 0.0005: # we're pretty close to the right value
@@ -432,17 +493,33 @@ class PID():
             self._motor.set_motor_power(_power_level)
 
             # remember some variables for next time ........................
+            self._second_last_error = self._last_error
             self._last_error = _error
-            self._sum_errors += _error
+            if not self._incremental:
+                # the integral is over the recent history: the oldest error is replaced by this one,
+                # the running sum compensated (Kahan) so that round-off doesn't accumulate over a long run
+                _index = self._error_index & ( _ERROR_HISTORY - 1 )
+                _y = ( _error - self._error_history[_index] ) - self._sum_errors_c
+                _t = self._sum_errors + _y
+                self._sum_errors_c = ( _t - self._sum_errors ) - _y
+                self._sum_errors = _t
+                self._error_history[_index] = _error
+                self._error_index = _index + 1
             _changed = True
 
         # if configured, capture odometry data ...................
-        if self._filewriter:
+        if self._filewriter and self._loop_count % self._odometry_decimate == 0:
             _elapsed = time.time() - self._start_time
-            _data = '{:>5.3f}\t{:>5.2f}\t{:>5.2f}\t{:>5.2f}\t{:d}\n'.format(_elapsed, ( _power_level * 100.0), _current_velocity, target_velocity, self.get_steps())
-            self._stats_queue.append(_data)
-            self._log.debug('odometry:' + Fore.BLACK + ' time: {:>5.3f};\tpower: {:>5.2f};\tvelocity: {:>5.2f}/{:>5.2f}\tsteps: {:d}'.format(\
-                    _elapsed, _power_level, _current_velocity, target_velocity, self.get_steps()))
+            _steps = self.get_steps()
+            _elapsed_col, _power_col, _velocity_col, _target_col, _steps_col = self._odometry
+            _elapsed_col.append(_elapsed)
+            _power_col.append(_power_level * 100.0)
+            _velocity_col.append(_current_velocity)
+            _target_col.append(target_velocity)
+            _steps_col.append(_steps)
+            if self._debug:
+                self._log.debug('odometry:' + Fore.BLACK + ' time: {:>5.3f};\tpower: {:>5.2f};\tvelocity: {:>5.2f}/{:>5.2f}\tsteps: {:d}'.format(\
+                        _elapsed, _power_level, _current_velocity, target_velocity, _steps))
 
         return _changed
 
@@ -483,11 +560,17 @@ class PID():
             If a FileWriter is set then the Motor will generate odometry data
             and write this to a data file whose directory and filename are
             determined by configuration.
+
+            The data is collected as typed columns, one value per column
+            on each PID loop, and only formatted as rows on close.
         '''
         self._filewriter = filewriter
         if self._filewriter:
             if self._stats_queue is None:
                 self._stats_queue = deque()
+            if self._odometry is None:
+                # elapsed sec, power, velocity, target velocity, steps
+                self._odometry = ( array('f'), array('f'), array('f'), array('f'), array('l') )
             self._filewriter.enable(self._stats_queue)
             self._log.info('filewriter enabled.')
 
@@ -496,6 +579,7 @@ class PID():
         if not self._filewriter_closed:
             self._filewriter_closed = True
             if self._filewriter:
+                self._stats_queue.append(''.join([ _ODOMETRY_FORMAT % _row for _row in zip(*self._odometry) ]))
                 _tuning = self.get_tuning_info()
                 self._filewriter.write_gnuplot_settings(_tuning)
                 self._filewriter.disable()
@@ -507,9 +591,9 @@ class PID():
     @staticmethod
     def equals_zero(value):
         '''
-            Returns True if the value is within 2% of 0.0.
+            Returns True if the value is within 0.02 of 0.0.
         '''
-        return numpy.isclose(value, 0.0, rtol=0.02, atol=0.0)
+        return -0.02 <= value <= 0.02
 
     # ..............................................................................
     def get_distance_cm_for_steps(self, steps):
@@ -13,8 +13,7 @@
 # https://docs.python.org/3/library/heapq.html
 
 #from flask import jsonify
-import queue, itertools
-from queue import Empty
+import heapq, itertools, threading
 from colorama import init, Fore, Style
 init()
 
@@ -29,6 +28,10 @@ class MessageQueue():
         A priority message queue, where the highest priority is the lowest 
         priority number.
 
+        The messages are held on a heap guarded by a single lock, which is
+        all that's needed here: the blocking put, task tracking and second
+        condition of a queue.PriorityQueue are never used.
+
         The MessageFactory parameter is optional if not using the FlaskWrapper
         (which calls the respond() method).
     '''
@@ -41,7 +44,9 @@ class MessageQueue():
         self._log.debug('initialised MessageQueue...')
         self._counter = itertools.count()
         self._message_factory = message_factory
-        self._queue = queue.PriorityQueue(MessageQueue.MAX_SIZE)
+        self._heap = []
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
         self._consumers = []
         self._log.info('MessageQueue ready.')
 
@@ -67,14 +72,16 @@ class MessageQueue():
         '''
         Add a new Message to the queue, then additionally to any consumers.
         '''
-        if self._queue.full():
-            try:
-                _dumped = self._queue.get()
-                self._log.debug('dumping old message eid#{}/msg#{}: {}'.format(_dumped.eid, _dumped.number, _dumped.description))
-            except Empty:
-                pass
         message.number = next(self._counter)
-        self._queue.put(message);
+        with self._lock:
+            if len(self._heap) >= MessageQueue.MAX_SIZE:
+                _dumped = heapq.heappop(self._heap)
+            else:
+                _dumped = None
+            heapq.heappush(self._heap, message)
+            self._not_empty.notify()
+        if _dumped is not None:
+            self._log.debug('dumping old message eid#{}/msg#{}: {}'.format(_dumped.eid, _dumped.number, _dumped.description))
         self._log.debug('added message eid#{}/msg#{} to queue: priority {}: {}'.format(message.eid, message.number, message.priority, message.description))
         # add to any consumers
         for consumer in self._consumers:
@@ -85,25 +92,27 @@ class MessageQueue():
         '''
             Returns true if the queue is empty.
         '''
-        return self._queue.empty()
+        return not self._heap
 
     # ......................................................
     def size(self):
         '''
-            Returns the current size of the queue. This returns "the approximate size of the queue (not reliable!)"
+            Returns the current size of the queue. As other threads may add
+            or remove messages this is only a snapshot.
         '''
-        return self._queue.qsize()
+        return len(self._heap)
 
     # ......................................................
     def next(self):
         '''
-            Return the next highest priority message in the queue.
+            Return the next highest priority message in the queue, waiting
+            for one if the queue is empty.
         '''
-        try:
-            message = self._queue.get()
-        except Empty:
-            pass
-        self._log.info(Fore.BLACK + 'returning message: {} of priority {}; queue size: {:d}'.format(message.description, message.priority, self._queue.qsize()))
+        with self._not_empty:
+            while not self._heap:
+                self._not_empty.wait()
+            message = heapq.heappop(self._heap)
+        self._log.info(Fore.BLACK + 'returning message: {} of priority {}; queue size: {:d}'.format(message.description, message.priority, len(self._heap)))
         return message
 
     # ......................................................
@@ -112,14 +121,12 @@ class MessageQueue():
             Returns a list of the highest priority messages on the queue, whose size is either
             the count or all the remaining messages if their number is less than the count.
         '''
-        try:
-            messages = []
-            while len(messages) < count and not self._queue.empty():
-                message = self._queue.get()
-                self._log.debug('adding message {} of priority {} to returned list...'.format(message.description, message.priority))
-                messages.append(message)
-        except Empty:
-            pass
+        messages = []
+        with self._lock:
+            while len(messages) < count and self._heap:
+                messages.append(heapq.heappop(self._heap))
+        for message in messages:
+            self._log.debug('adding message {} of priority {} to returned list...'.format(message.description, message.priority))
         self._log.debug('returning {} messages.'.format(len(messages)))
         return messages
 
@@ -140,11 +147,7 @@ class MessageQueue():
         '''
             Clears all messages from the queue.
         '''
-        while not self._queue.empty():
-            try:
-                self._queue.get(False)
-            except Empty:
-                continue
-            self._queue.task_done()
+        with self._lock:
+            self._heap.clear()
 
 #EOF
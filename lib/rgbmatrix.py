@@ -62,6 +62,7 @@ class RgbMatrix(Feature):
         self._max_value = 0.0 # TEMP
         self._buf = numpy.zeros((self._rgbmatrix5x5_STBD._width, self._rgbmatrix5x5_STBD._height))
         self._colors = [ Color.GREEN, Color.YELLOW_GREEN, Color.YELLOW, Color.ORANGE, Color.RED ]
+        self._rgbs = [ _color.rgb for _color in self._colors ]
         self._log.info('ready.')
 
     # ..........................................................................
@@ -190,9 +191,7 @@ class RgbMatrix(Feature):
 
 #               self._log.info(Fore.MAGENTA + 'p_y={}; _value: {}'.format(p_y, _value) + Style.RESET_ALL)
                 for p_x in range(0, _width):
-                    _r = self._colors[p_x].red
-                    _g = self._colors[p_x].green
-                    _b = self._colors[p_x].blue
+                    _r, _g, _b = self._rgbs[p_x]
                     if _value <= 10.0:
                         _r = (_value / 10.0) * _r
                         _g = (_value / 10.0) * _g
@@ -14,11 +14,13 @@
 # Unconfigured it always returns 0.0, which is harmless but not useful.
 
 import math
+from bisect import bisect_right
 from enum import Enum
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Level, Logger
+from lib.jit import njit, NUMBA_AVAILABLE
 
 # ..............................................................................
 class Velocity(Enum):
@@ -86,21 +88,32 @@ class Velocity(Enum):
         '''
             Provided a value between 0-100, return the next lower Velocity.
         '''
-        if velocity < Velocity.DEAD_SLOW.value:
-            return Velocity.STOP
-        elif velocity < Velocity.SLOW.value:
-            return Velocity.DEAD_SLOW
-        elif velocity < Velocity.ONE_THIRD.value:
-            return Velocity.SLOW
-        elif velocity < Velocity.HALF.value:
-            return Velocity.ONE_THIRD
-        elif velocity < Velocity.TWO_THIRDS.value:
-            return Velocity.HALF
-        elif velocity < Velocity.THREE_QUARTER.value:
-            return Velocity.TWO_THIRDS
-        elif velocity < Velocity.FULL.value:
-            return Velocity.THREE_QUARTER
-        else:
-            return Velocity.FULL
+        return _SLOWER_VELOCITIES[slower_index(velocity)]
+
+
+# lookup tables for Velocity.get_slower_than(): a velocity below the nth
+# threshold (as a percentage) is slower than the nth Velocity.
+_SLOWER_VELOCITIES = [ Velocity.STOP, Velocity.DEAD_SLOW, Velocity.SLOW, Velocity.ONE_THIRD, Velocity.HALF,
+                       Velocity.TWO_THIRDS, Velocity.THREE_QUARTER, Velocity.FULL ]
+_SLOWER_THRESHOLDS = tuple( _velocity.percentage for _velocity in _SLOWER_VELOCITIES[1:] )
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def slower_index(velocity):
+        '''
+            Returns the index of the Velocity slower than the value, compiled
+            by numba so that it may also be called from other compiled code.
+        '''
+        _index = 0
+        for _threshold in _SLOWER_THRESHOLDS:
+            if velocity >= _threshold:
+                _index += 1
+        return _index
+else:
+    def slower_index(velocity):
+        '''
+            Returns the index of the Velocity slower than the value.
+        '''
+        return bisect_right(_SLOWER_THRESHOLDS, velocity)
 
 #EOF
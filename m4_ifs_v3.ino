@@ -36,11 +36,22 @@
       requestData(): when called this responds with the register value.
 
     Due to the one byte limit, returned values are limited 0-255.
+
+    If instead of a pin number the master sends READ_ALL_COMMAND, the next
+    request is answered with all eight values in a single 8 byte response,
+    in pin order (1-5, then 9-11).
+
+    INTERRUPT_PIN is held low while any sensor is triggered (the same
+    conditions that blink the DotStar) and high otherwise, so that the
+    master can wait on its falling edge rather than continually polling.
 */
 
 #define SLAVE_I2C_ADDRESS            0x08
 #define LOOP_DELAY_MS                  50
 #define NULL_VALUE                    255   // returned on error
+#define READ_ALL_COMMAND             0xFF   // request all pin values at once
+#define READ_ALL_LENGTH                 8
+#define INTERRUPT_PIN                   7   // active low, to a Raspberry Pi GPIO pin
 
 // CONSTANTS .....................................
 
@@ -75,6 +86,8 @@ const int STBD_SIDE_TRIGGER_DISTANCE_FAR = 60;
 
 long loopCount          = 0;           // number of times loop() has been called
 byte stored_byte        = NULL_VALUE;  // placeholder for value
+boolean read_all        = false;       // true if the next request is for all values
+byte all_bytes[READ_ALL_LENGTH];       // the response to READ_ALL_COMMAND
 int trigger_blink_time  = 5;            // how long to blink following a trigger
 
 int port_side_ir_value  = 0;
@@ -149,6 +162,8 @@ void setup() {
   pinMode(PORT_BUMPER_PIN, INPUT_PULLUP);
   pinMode(CENTER_BUMPER_PIN, INPUT_PULLUP);
   pinMode(STBD_BUMPER_PIN, INPUT_PULLUP);
+  pinMode(INTERRUPT_PIN, OUTPUT);
+  digitalWrite(INTERRUPT_PIN, HIGH);
 
   Wire.begin(SLAVE_I2C_ADDRESS);
   Wire.onReceive(receiveData);
@@ -183,7 +198,19 @@ void loop() {
     Sends the contents of the stored byte over the Wire.
 */
 void requestData() {
-  Wire.write(stored_byte);
+  if ( read_all ) {
+    all_bytes[0] = port_side_ir_value;
+    all_bytes[1] = port_ir_value;
+    all_bytes[2] = center_ir_value;
+    all_bytes[3] = stbd_ir_value;
+    all_bytes[4] = stbd_side_ir_value;
+    all_bytes[5] = port_bumper_value;
+    all_bytes[6] = center_bumper_value;
+    all_bytes[7] = stbd_bumper_value;
+    Wire.write(all_bytes, READ_ALL_LENGTH);
+  } else {
+    Wire.write(stored_byte);
+  }
 }
 
 /**
@@ -196,6 +223,7 @@ void receiveData(int byteCount) {
   while ( Wire.available() ) {
     read_byte = Wire.read();
   }
+  read_all = ( read_byte == READ_ALL_COMMAND );
   switch ( read_byte ) {
     case PORT_SIDE_INFRARED_PIN:
       stored_byte = port_side_ir_value;
@@ -228,48 +256,63 @@ void receiveData(int byteCount) {
 }
 
 void readSensorValues() {
+  boolean triggered = false;
   port_side_ir_value  = constrainAnalogValue(analogRead(PORT_SIDE_INFRARED_PIN));
   if ( port_side_ir_value > PORT_SIDE_TRIGGER_DISTANCE ) {
+    triggered = true;
     blink_color(RED, trigger_blink_time);
   } else if ( port_side_ir_value > PORT_SIDE_TRIGGER_DISTANCE_FAR ) {
+    triggered = true;
     blink_color(DARK_RED, trigger_blink_time);
   }
   port_ir_value = constrainAnalogValue(analogRead(PORT_INFRARED_PIN));
   if ( port_ir_value > PORT_TRIGGER_DISTANCE ) {
+    triggered = true;
     blink_color(MAGENTA, trigger_blink_time);
   } else if ( port_ir_value > PORT_TRIGGER_DISTANCE_FAR ) {
+    triggered = true;
     blink_color(DARK_MAGENTA, trigger_blink_time);
   }
   center_ir_value = constrainAnalogValue(analogRead(CENTER_INFRARED_PIN));
   if ( center_ir_value > CENTER_TRIGGER_DISTANCE ) {
+    triggered = true;
     blink_color(BLUE, trigger_blink_time);
   } else if ( center_ir_value > CENTER_TRIGGER_DISTANCE_FAR ) {
+    triggered = true;
     blink_color(DARK_BLUE, trigger_blink_time);
   }
   stbd_ir_value = constrainAnalogValue(analogRead(STBD_INFRARED_PIN));
   if ( stbd_ir_value > STBD_TRIGGER_DISTANCE ) {
+    triggered = true;
     blink_color(CYAN, trigger_blink_time);
   } else if ( stbd_ir_value > STBD_TRIGGER_DISTANCE_FAR ) {
+    triggered = true;
     blink_color(DARK_CYAN, trigger_blink_time);
   }
   stbd_side_ir_value = constrainAnalogValue(analogRead(STBD_SIDE_INFRARED_PIN));
   if ( stbd_side_ir_value > STBD_SIDE_TRIGGER_DISTANCE ) {
+    triggered = true;
     blink_color(GREEN, trigger_blink_time);
   } else if ( stbd_side_ir_value > STBD_SIDE_TRIGGER_DISTANCE_FAR ) {
+    triggered = true;
     blink_color(DARK_GREEN, trigger_blink_time);
   }
   port_bumper_value = !digitalRead(PORT_BUMPER_PIN);
   if ( port_bumper_value == 1 ) {
+    triggered = true;
     blink_color(RED, trigger_blink_time);
   }
   center_bumper_value = !digitalRead(CENTER_BUMPER_PIN);
   if ( center_bumper_value == 1 ) {
+    triggered = true;
     blink_color(BLUE, trigger_blink_time);
   }
   stbd_bumper_value = !digitalRead(STBD_BUMPER_PIN);
   if ( stbd_bumper_value == 1 ) {
+    triggered = true;
     blink_color(GREEN, trigger_blink_time);
   }
+  digitalWrite(INTERRUPT_PIN, triggered ? LOW : HIGH);
   if ( isVerbose ) {
     sprintf(buf, "[%05ld]: %2d << %2d < %2d > %2d >> %2d", loopCount, port_side_ir_value, port_ir_value, center_ir_value, stbd_ir_value, stbd_side_ir_value );
     Serial.println(buf);
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 by Murray Altheim. All rights reserved. This file is part of
+# the Robot OS project and is released under the "Apache Licence, Version 2.0".
+# Please see the LICENSE file included as part of this package.
+#
+# Tests that Motor.cancel() isn't followed by a power the motor's writer
+# thread had pending. This uses a recording ThunderBorg and pigpio stand-in
+# rather than the hardware, so it can be run off the robot.
+#
+
+import threading, time
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.motor_v2 import Motor
+
+# ..............................................................................
+class RecordingThunderBorg():
+    '''
+        Records the power written to each motor channel. A write of the
+        blocking power waits until released, holding the writer thread
+        (and the motor's power lock) mid-write.
+    '''
+    def __init__(self, blocking_power):
+        self.writes = []
+        self.blocking_power = blocking_power
+        self.entered = threading.Event()
+        self.released = threading.Event()
+
+    def SetMotor1(self, power):
+        self.writes.append(power)
+        if power == self.blocking_power:
+            self.entered.set()
+            self.released.wait()
+
+    def SetMotor2(self, power):
+        self.SetMotor1(power)
+
+    def GetMotor1(self):
+        return self.writes[-1] if self.writes else 0.0
+
+    def GetMotor2(self):
+        return self.GetMotor1()
+
+# ..............................................................................
+class NullPi():
+    '''
+        Accepts the rotary encoder's pigpio configuration calls.
+    '''
+    class _Callback():
+        def cancel(self):
+            pass
+
+    def set_mode(self, gpio, mode):
+        pass
+
+    def set_pull_up_down(self, gpio, pud):
+        pass
+
+    def callback(self, gpio, edge, func):
+        return NullPi._Callback()
+
+    def stop(self):
+        pass
+
+# ..............................................................................
+def test_cancel_discards_pending_power():
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _tb = RecordingThunderBorg(blocking_power=0.5)
+    Motor._motors.clear()
+    _motor = Motor(_config, _tb, NullPi(), Orientation.PORT, Level.WARN)
+    _motor.enable()
+    try:
+        # the writer is held mid-write of 0.5 while 0.7 is queued behind it
+        _motor._write_power(0.5)
+        assert _tb.entered.wait(timeout=2.0), 'writer thread never wrote the first power.'
+        _motor._write_power(0.7)
+        _cancel = threading.Thread(target=Motor.cancel)
+        _cancel.start()
+        time.sleep(0.1) # let cancel() reach the power lock
+        _tb.released.set()
+        _cancel.join(timeout=2.0)
+        assert not _cancel.is_alive(), 'cancel() did not return.'
+    finally:
+        _tb.released.set()
+        _motor.disable() # joins the writer, so any stale write has happened
+        Motor._motors.clear()
+    assert _tb.writes[-1] == 0.0, 'last power written was {} rather than 0.0.'.format(_tb.writes[-1])
+    assert _motor.get_current_power_level() == 0.0
+
+# ..............................................................................
+def main():
+    test_cancel_discards_pending_power()
+    print('motor_cancel_test :' + Fore.CYAN + ' INFO  : passed.' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
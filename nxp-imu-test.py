@@ -18,7 +18,8 @@
 #  This is very preliminary work and currently non-functional.
 #
 
-import sys, time, math
+import sys, time
+from math import degrees, atan2
 from colorama import init, Fore, Style
 init()
 
@@ -27,7 +28,11 @@ from lib.logger import Level, Logger
 from lib.queue import MessageQueue
 from lib.indicator import Indicator
 from lib.nxp9dof import NXP9DoF
-from lib.rate import Rate
+from lib.orientation import get_orientation
+
+# the ahrs2 row format, with its colors resolved once at load
+_AHRS2_FORMAT = Fore.MAGENTA + '| %6.1f %6.1f %6.1f ' + Fore.YELLOW + '| %6.1f %6.1f %6.1f ' + Fore.CYAN + '| %6.1f %6.1f %6.1f ' \
+        + Fore.WHITE + '| %6.1f' + Style.BRIGHT + ' %6.1f ' + Style.NORMAL + ' |' + Style.RESET_ALL
 
 
 class NXP():
@@ -37,13 +42,9 @@ class NXP():
         self._imu = nxp.get_imu()
         self._fxos = nxp.get_fxos()
         self._fxas = nxp.get_fxas()
+        self._read_accel_mag = nxp.read_accel_mag
         self._log.info('ready.')
 
-    # ..........................................................................
-    @staticmethod
-    def to_degrees(radians):
-        return math.degrees(radians)
-
     # ..........................................................................
     def imu(self, count):
         header = 67
@@ -74,7 +75,7 @@ class NXP():
         for _ in range(count):
             a, m, g = self._imu.get()
             m = mag_x, mag_y, mag_z
-            r, p, h = self._imu.getOrientation(a, m)
+            r, p, h = get_orientation(a[0], a[1], a[2], m[0], m[1], m[2])
             self._log.info(Fore.GREEN + '| {:>6.1f} {:>6.1f} {:>6.1f} | {:>6.1f} {:>6.1f} {:>6.1f} |'.format(a[0], a[1], a[2], r, p, h) + Style.RESET_ALL)
             time.sleep(0.50)
         self._log.info('-' * header)
@@ -97,9 +98,7 @@ class NXP():
 #       for _ in range(count):
 #       a, m, g = self._imu.get()
 
-        accel_x, accel_y, accel_z = self._fxos.accelerometer
-
-        a = accel_x, accel_y, accel_z
+        ( accel_x, accel_y, accel_z ), ( mag_x, mag_y, mag_z ) = self._read_accel_mag()
 
 #       a = accel_z, accel_x, accel_y
 #       a = accel_y, accel_z, accel_x
@@ -108,18 +107,14 @@ class NXP():
 #       a = accel_x, accel_z, accel_y
 #       a = accel_y, accel_x, accel_z
 
-        mag_x, mag_y, mag_z = self._fxos.magnetometer
-        m = mag_x, mag_y, mag_z
-
         gyro_x, gyro_y, gyro_z = self._fxas.gyroscope
-        g = gyro_x, gyro_y, gyro_z
 
-        r, p, h = self._imu.getOrientation(a, m)
+        r, p, h = get_orientation(accel_x, accel_y, accel_z, mag_x, mag_y, mag_z)
 
-        _heading = math.degrees(h)
+        _heading = degrees(h)
 
 #       _heading_calc = (math.atan2(mag_x, mag_y) * 180.0) / math.pi
-        _heading_calc = (math.atan2(mag_z, mag_y) * 180.0) / math.pi
+        _heading_calc = degrees(atan2(mag_z, mag_y))
         if _heading_calc < 0:
             _heading_calc += 360
 
@@ -129,10 +124,7 @@ class NXP():
 #       _heading_calc = (math.atan2(mag_z, mag_y) * 180.0) / math.pi
 #       _heading_calc = (math.atan2(mag_y, mag_z) * 180.0) / math.pi
 
-        self._log.info(Fore.MAGENTA + '| {:>6.1f} {:>6.1f} {:>6.1f} '.format(a[0], a[1], a[2]) \
-                     +Fore.YELLOW + '| {:>6.1f} {:>6.1f} {:>6.1f} '.format(m[0], m[1], m[2]) \
-                     +Fore.CYAN + '| {:>6.1f} {:>6.1f} {:>6.1f} '.format(g[0], g[1], g[2]) \
-                     +Fore.WHITE + '| {:>6.1f}'.format(_heading) + Style.BRIGHT + ' {:>6.1f} '.format(_heading_calc) + Style.NORMAL + ' |' + Style.RESET_ALL)
+        self._log.info(_AHRS2_FORMAT, accel_x, accel_y, accel_z, mag_x, mag_y, mag_z, gyro_x, gyro_y, gyro_z, _heading, _heading_calc)
 #       self._log.info(Fore.CYAN    + '| {:>6.1f} {:>6.1f} {:>6.1f} | {:>6.1f} {:>6.1f} {:>6.1f} |'.format(m[0], m[1], m[2], g[0], g[1], g[2]) + Style.RESET_ALL)
         if print_info and False:
             self._log.info('-' * header)
@@ -148,7 +140,7 @@ class NXP():
         self._log.info('')
         for _ in range(count):
             a, m, g = self._imu.get()
-            _roll, _pitch, _heading = self._imu.getOrientation(a, m)
+            _roll, _pitch, _heading = get_orientation(a[0], a[1], a[2], m[0], m[1], m[2])
             # make easier to read even if completely wrong:
             _roll = _roll * 100.0
             _pitch = _pitch * 100.0
@@ -174,7 +166,10 @@ def main():
 #       _nxp.enable()
 #       _nxp9dof.enable()
 
-        _rate = Rate(5)  # 20Hz
+        # each loop is scheduled against an absolute deadline at 5Hz, so
+        # that the time spent reading and logging doesn't accumulate as drift
+        _period = 0.2
+        _deadline = time.monotonic() + _period
 
         _nxp.ahrs2(True)
         while True:
@@ -185,7 +180,12 @@ def main():
 #           time.sleep(1.0)
 #           print(Fore.CYAN + Style.BRIGHT + 'imu...' + Style.RESET_ALL)
 #           _nxp.imu(10)
-            _rate.wait()
+            _sleep_sec = _deadline - time.monotonic()
+            if _sleep_sec > 0.0:
+                time.sleep(_sleep_sec)
+                _deadline += _period
+            else: # overran the period: resynchronise rather than try to catch up
+                _deadline = time.monotonic() + _period
 
     except KeyboardInterrupt:
         print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
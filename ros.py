@@ -41,10 +41,10 @@ from lib.switch import Switch
 from lib.button import Button
 from lib.batterycheck import BatteryCheck
 from lib.temperature import Temperature
-from lib.lidar import Lidar
 from lib.matrix import Matrix
-from lib.rgbmatrix import RgbMatrix, DisplayType
 from lib.bno055 import BNO055
+# the Lidar, RgbMatrix and flask service (and their numpy, flask and gevent
+# dependencies) are imported only once the features using them are configured
 
 #from lib.player import Player
 #from lib.rgbmatrix import RgbMatrix
@@ -58,9 +58,6 @@ led_1_path = '/sys/class/leds/led1/brightness'
 
 _level = Level.INFO
 
-# import RESTful Flask Service
-from flask_wrapper import FlaskWrapperService
-
 # ==============================================================================
 
 # ROS ..........................................................................
@@ -101,20 +98,27 @@ class ROS(AbstractTask):
         super().__init__("ros", self._queue, None, None, self._mutex)
         self._log.info('initialising...')
         self._active        = False
+        self._closed_event  = threading.Event() # set upon close, ending the main loop
         self._closing       = False
-        self._disable_leds  = False
 #       self._switch        = None
         self._motors        = None
         self._arbitrator    = None
         self._controller    = None
         self._gamepad       = None
+        self._gamepad_ready = threading.Event() # set once the gamepad has connected or been given up on
         self._features = []
-#       self._flask_wrapper = None
+        self._flask_wrapper = None
         # read YAML configuration
         _loader = ConfigLoader(Level.INFO)
         filename = 'config.yaml'
         self._config = _loader.configure(filename)
         self._gamepad_enabled = self._config['ros'].get('gamepad').get('enabled')
+        self._enable_self_shutdown = self._config['ros'].get('enable_self_shutdown')
+        _pi_config = self._config['pi']
+        self._disable_leds  = _pi_config.get('disable_leds')
+        self._sudo_name     = _pi_config.get('sudo_name')
+        self._led_0_path    = _pi_config.get('led_0_path')
+        self._led_1_path    = _pi_config.get('led_1_path')
         self._log.info('initialised.')
         self._configure()
 
@@ -131,7 +135,7 @@ class ROS(AbstractTask):
         hexAddresses = scanner.getHexAddresses()
         self._addrDict = dict(list(map(lambda x, y:(x,y), self._addresses, hexAddresses)))
         for i in range(len(self._addresses)):
-            self._log.debug(Fore.BLACK + Style.DIM + 'found device at address: {}'.format(hexAddresses[i]) + Style.RESET_ALL)
+            self._log.debug(Fore.BLACK + Style.DIM + 'found device at address: %s' + Style.RESET_ALL, hexAddresses[i])
 
         self._log.info('configure default features...')
         # standard devices ...........................................
@@ -186,6 +190,7 @@ class ROS(AbstractTask):
 
         if rgbmatrix5x5_stbd_available or rgbmatrix5x5_port_available:
             self._log.info('configure rgbmatrix...')
+            from lib.rgbmatrix import RgbMatrix
             self._rgbmatrix = RgbMatrix(Level.INFO)
             self.add_feature(self._rgbmatrix) # FIXME this is added twice
 
@@ -257,7 +262,7 @@ class ROS(AbstractTask):
         self._log.info(Fore.YELLOW + '-- unaccounted for self._addresses:')
         for i in range(len(self._addresses)):
             hexAddr = self._addrDict.get(self._addresses[i])
-            self._log.info(Fore.YELLOW + Style.BRIGHT + '-- address: {}'.format(hexAddr) + Style.RESET_ALL)
+            self._log.info(Fore.YELLOW + Style.BRIGHT + '-- address: %s' + Style.RESET_ALL, hexAddr)
 
 
     # ..........................................................................
@@ -265,7 +270,7 @@ class ROS(AbstractTask):
         '''
             Sets a feature's availability to the boolean value.
         '''
-        self._log.debug(Fore.BLUE + Style.BRIGHT + '-- set feature available. name: \'{}\' value: \'{}\'.'.format(name, value))
+        self._log.debug(Fore.BLUE + Style.BRIGHT + '-- set feature available. name: \'%s\' value: \'%s\'.', name, value)
         self.set_property('features', name, value)
 
 
@@ -299,7 +304,7 @@ class ROS(AbstractTask):
             Set the value of the named property of the application
             configuration, provided its section, property name and value.
         '''
-        self._log.debug(Fore.GREEN + 'set config on section \'{}\' for property key: \'{}\' to value: {}.'.format(section, property_name, property_value))
+        self._log.debug(Fore.GREEN + 'set config on section \'%s\' for property key: \'%s\' to value: %s.', section, property_name, property_value)
         if section == 'ros':
             self._config[section].update(property_name = property_value)
         else:
@@ -312,17 +317,27 @@ class ROS(AbstractTask):
         '''
             Enables or disables the Raspberry Pi's board LEDs.
         '''
-        sudo_name = self.get_property('pi', 'sudo_name')
-        led_0_path = self._config['pi'].get('led_0_path')
-        led_1_path = self._config['pi'].get('led_1_path')
         if enable:
             self._log.info('re-enabling LEDs...')
-            os.system('echo 1 | {} tee {}'.format(sudo_name,led_0_path))
-            os.system('echo 1 | {} tee {}'.format(sudo_name,led_1_path))
+            _value = '1'
         else:
             self._log.debug('disabling LEDs...')
-            os.system('echo 0 | {} tee {}'.format(sudo_name,led_0_path))
-            os.system('echo 0 | {} tee {}'.format(sudo_name,led_1_path))
+            _value = '0'
+        for _path in ( self._led_0_path, self._led_1_path ):
+            self._write_pi_led(_path, _value)
+
+
+    # ..........................................................................
+    def _write_pi_led(self, path, value):
+        '''
+            Writes the value to the LED's sysfs brightness file. This is
+            written directly if we have permission, otherwise via sudo tee.
+        '''
+        try:
+            with open(path, 'w') as _file:
+                _file.write(value)
+        except PermissionError:
+            os.system('echo {} | {} tee {}'.format(value, self._sudo_name, path))
 
 
     # ..........................................................................
@@ -335,7 +350,7 @@ class ROS(AbstractTask):
             try:
                 self._gamepad = Gamepad(self._config, self._queue, Level.INFO)
             except GamepadConnectException as e:
-                self._log.error('unable to connect to gamepad: {}'.format(e))
+                self._log.error('unable to connect to gamepad: %s', e)
                 self._gamepad = None
                 self._gamepad_enabled = False
                 self._log.info('gamepad unavailable.')
@@ -349,7 +364,7 @@ class ROS(AbstractTask):
                 if _count == 1:
                     self._log.info('connecting to gamepad...')
                 else:
-                    self._log.info('gamepad not connected; re-trying... [{:d}]'.format(_count))
+                    self._log.info('gamepad not connected; re-trying... [%d]', _count)
                 self._gamepad.connect()
                 time.sleep(0.5)
                 if self._gamepad.has_connection() or _count > 5:
@@ -361,6 +376,16 @@ class ROS(AbstractTask):
         return self._gamepad is not None and self._gamepad.has_connection()
 
 
+    # ..........................................................................
+    def wait_for_gamepad(self, timeout):
+        '''
+            Waits until the gamepad has connected, failed to connect or
+            been found to be disabled, up to the timeout (in seconds).
+            Returns False if the timeout was reached first.
+        '''
+        return self._gamepad_ready.wait(timeout)
+
+
     # ..........................................................................
     def get_arbitrator(self):
         return self._arbitrator
@@ -373,13 +398,12 @@ class ROS(AbstractTask):
             an enable() method.
         '''
         self._features.append(feature)
-        self._log.info('added feature {}.'.format(feature.name()))
+        self._log.info('added feature %s.', feature.name())
 
 
     # ..........................................................................
     def _callback_shutdown(self):
-        _enable_self_shutdown = self._config['ros'].get('enable_self_shutdown')
-        if _enable_self_shutdown:
+        if self._enable_self_shutdown:
             self._log.critical('callback: shutting down os...')
             self.close()
             sys.exit(0)
@@ -407,14 +431,13 @@ class ROS(AbstractTask):
                 + 'ros\n'
         self._log.info(_banner)
 
-        self._disable_leds = self._config['pi'].get('disable_leds')
         if self._disable_leds:
             # disable Pi LEDs since they may be distracting
             self._set_pi_leds(False)
 
         self._log.info('enabling features...')
         for feature in self._features:
-            self._log.info('enabling feature {}...'.format(feature.name()))
+            self._log.info('enabling feature %s...', feature.name())
             feature.enable()
 
 #       __enable_player = self._config['ros'].get('enable_player')
@@ -430,6 +453,7 @@ class ROS(AbstractTask):
         ultraborg_available = True # self.get_property('features', 'ultraborg')
         if vl53l1x_available and ultraborg_available:
             self._log.critical('starting scanner tool...')
+            from lib.lidar import Lidar
             self._lidar = Lidar(self._config, Level.INFO)
             self._lidar.enable()
         else:
@@ -454,6 +478,7 @@ class ROS(AbstractTask):
         # bluetooth gamepad controller
         if self._gamepad_enabled:
             self._connect_gamepad()
+        self._gamepad_ready.set()
 
         self._log.warning('Press Ctrl-C to exit.')
 
@@ -484,21 +509,16 @@ class ROS(AbstractTask):
 
         # enable arbitrator tasks (normal functioning of robot)
 
-        main_loop_delay_ms = self._config['ros'].get('main_loop_delay_ms')
-        self._log.info('begin main os loop with {:d}ms delay.'.format(main_loop_delay_ms))
-        _loop_delay_sec = main_loop_delay_ms / 1000
-        _main_loop_count = 0
+        self._log.info('begin main os loop.')
         self._arbitrator.start()
         self._active = True
-        while self._active:
-#           The sensors and the flask service sends messages to the message queue,
-#           which forwards those messages on to the arbitrator, which chooses the
-#           highest priority message to send on to the controller. So the timing
-#           of this loop is inconsequential; it exists solely as a keep-alive.
-            _main_loop_count += 1
-            self._log.debug(Fore.BLACK + Style.DIM + '[{:d}] main loop...'.format(_main_loop_count))
-            time.sleep(_loop_delay_sec)
-            # end application loop .........................
+#       The sensors and the flask service sends messages to the message queue,
+#       which forwards those messages on to the arbitrator, which chooses the
+#       highest priority message to send on to the controller. So this thread
+#       has no work of its own: it exists solely as a keep-alive, blocking
+#       until close() sets the event rather than waking up to poll.
+        self._closed_event.wait()
+        # end application loop .........................
     
         if not self._closing:
             self._log.warning('closing following loop...')
@@ -514,6 +534,8 @@ class ROS(AbstractTask):
         try:
             self._mutex.acquire()
             self._log.info('starting web service...')
+            # import RESTful Flask Service
+            from flask_wrapper import FlaskWrapperService
             self._flask_wrapper = FlaskWrapperService(self._queue, self._controller)
             self._flask_wrapper.start()
         except KeyboardInterrupt:
@@ -563,6 +585,8 @@ class ROS(AbstractTask):
         else:
             self._active = False
             self._closing = True
+            self._closed_event.set()
+            self._gamepad_ready.set()
             self._log.info(Style.BRIGHT + 'closing...')
 
             if self._gamepad:
@@ -574,7 +598,7 @@ class ROS(AbstractTask):
 
             # close features
             for feature in self._features:
-                self._log.info('closing feature {}...'.format(feature.name()))
+                self._log.info('closing feature %s...', feature.name())
                 feature.close()
             self._log.info('finished closing features.')
 
@@ -585,8 +609,8 @@ class ROS(AbstractTask):
             if self._controller:
                 self._controller.disable()
 
-#           if self._flask_wrapper is not None:
-#               self._flask_wrapper.close()
+            if self._flask_wrapper is not None:
+                self._flask_wrapper.close()
 
             super().close()
 
@@ -23,18 +23,35 @@ except Exception:
     sys.exit("This script requires the python-daemon module.\nInstall with: sudo pip3 install python-daemon")
 
 import os, signal, sys, time, threading, traceback, itertools
-from datetime import datetime
+from datetime import datetime, timezone
 import RPi.GPIO as GPIO
-from colorama import init, Fore, Style
-init()
 
 from lib.logger import Level, Logger
 from lib.config_loader import ConfigLoader
-from ros import ROS
-from lib.gamepad_demo import GamepadDemo
+# ROS and GamepadDemo are imported only by the application that uses them
 
 PIDFILE = '/home/pi/ros/.rosd.pid'
 
+# the time allowed for the toggle switch to settle following an edge
+_SETTLE_SEC = 0.1
+
+# the interval between 'waiting' heartbeat log messages
+_HEARTBEAT_SEC = 20.0
+
+# the longest we wait for ROS to connect to its gamepad (if enabled)
+_GAMEPAD_TIMEOUT_SEC = 10.0
+
+# ..............................................................................
+class _Timestamp():
+    '''
+        A log argument that formats the current UTC time as ISO 8601 only
+        if the message is actually emitted.
+    '''
+    def __str__(self):
+        return datetime.now(timezone.utc).isoformat()
+
+_TIMESTAMP = _Timestamp()
+
 # ..............................................................................
 
 def shutdown(signum, frame):  # signum and frame are mandatory
@@ -62,27 +79,58 @@ class RosDaemon():
         self._switch_pin  = self._config.get('switch_pin') # default 14
         self._led_pin     = self._config.get('led_pin')    # default 27
         self._application = self._config.get('application') # 'ros' | 'gamepad'
-        self._log.info('initialising with switch on pin {} and LED on pin {}.'.format(self._switch_pin, self._led_pin))
+        self._log.info('initialising with switch on pin %s and LED on pin %s.', self._switch_pin, self._led_pin)
         self._gpio.setup(self._switch_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         self._gpio.setup(self._led_pin, GPIO.OUT, initial=GPIO.LOW)
+        # the main loop sleeps until the switch changes rather than polling it
+        self._edge_event = threading.Event()
+        self._gpio.add_event_detect(self._switch_pin, GPIO.BOTH, callback=self._on_edge, bouncetime=50)
         self._counter = itertools.count()
+        self._next_count = self._counter.__next__
         self._old_state  = False
         self._ros        = None
+        self._arbitrator = None
         self._gamepad    = None
         self._loop_count = 0
         self._thread_timeout_delay_sec = 1
+        # the heartbeat is logged from its own thread so that it's independent of the switch
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name='rosd-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
         _rosd_mask = os.umask(0)
         os.umask(_rosd_mask)
-        self._log.info('mask: {}'.format(_rosd_mask))
-        self._log.info('uid:  {}'.format(os.getuid()))
-        self._log.info('gid:  {}'.format(os.getgid()))
-        self._log.info('cwd:  {}'.format(os.getcwd()))
-        self._log.info('pid file: {}'.format(PIDFILE))
+        self._log.info('mask: %s', _rosd_mask)
+        self._log.info('uid:  %s', os.getuid())
+        self._log.info('gid:  %s', os.getgid())
+        self._log.info('cwd:  %s', os.getcwd())
+        self._log.info('pid file: %s', PIDFILE)
         self._log.info('rosd ready.')
 
     # ..........................................................................
-    def _get_timestamp(self):
-        return datetime.utcfromtimestamp(datetime.utcnow().timestamp()).isoformat()
+    def _heartbeat(self):
+        '''
+            Logs a 'waiting' message every _HEARTBEAT_SEC until closed.
+        '''
+        while not self._heartbeat_stop.wait(_HEARTBEAT_SEC):
+            self._loop_count = self._next_count()
+            self._log.info('[%s] ros daemon waiting...', self._loop_count)
+
+    # ..........................................................................
+    def _on_edge(self, channel):
+        '''
+            The GPIO callback upon either edge of the toggle switch pin.
+        '''
+        self._edge_event.set()
+
+    # ..........................................................................
+    def wait_for_edge(self):
+        '''
+            Blocks until the toggle switch changes, then waits for it to
+            settle so that read_state() sees its final value.
+        '''
+        self._edge_event.wait()
+        time.sleep(_SETTLE_SEC)
+        self._edge_event.clear()
 
     # ..........................................................................
     def read_state(self):
@@ -92,15 +140,12 @@ class RosDaemon():
             if the value has changed since last reading.
         '''
         self._state = not GPIO.input(self._switch_pin)
-        self._loop_count = next(self._counter)
-        if self._loop_count % 10 == 0:
-            self._log.info('[{}] ros daemon waiting...'.format(self._loop_count))
         if self._state is not self._old_state: # if low
             if self._state:
-                self._log.info('enabling from state: {}'.format(self._state))
+                self._log.info('enabling from state: %s', self._state)
                 self.enable()
             else:
-                self._log.info('disabling from state: {}'.format(self._state))
+                self._log.info('disabling from state: %s', self._state)
                 self.disable()
         self._old_state = self._state
         return self._state
@@ -124,38 +169,44 @@ class RosDaemon():
             raise Exception('unrecognised application: "{}"'.format(self._application))
 
     def _set_status_led(self, enable):
-        if enable:
-            self._gpio.output(self._led_pin, True)
-        else:
-            self._gpio.output(self._led_pin, False)
+        self._gpio.output(self._led_pin, bool(enable))
+
+    # ..........................................................................
+    def _get_arbitrator(self):
+        '''
+            Returns the ROS arbitrator, cached upon first use. This isn't
+            fetched at start() as ROS creates its arbitrator on its own thread.
+        '''
+        if self._arbitrator is None:
+            self._arbitrator = self._ros.get_arbitrator()
+        return self._arbitrator
 
     # ..........................................................................
     def _enable_ros(self):
-        self._log.info('ros state enabled at: {}'.format(self._get_timestamp()))
+        self._log.info('ros state enabled at: %s', _TIMESTAMP)
         if self._ros is None:
             self._log.info('starting ros thread...')
+            from ros import ROS
             self._ros = ROS()
             self._ros._log.set_mutex(self._log.get_mutex())
             self._ros.start()
             self._log.info('ros started.')
-            time.sleep(1.0)
+            self._ros.wait_for_gamepad(_GAMEPAD_TIMEOUT_SEC)
             if self._ros.has_connected_gamepad():
                 self._log.info('gamepad is available and connected.')
             else:
                 self._log.warning('no connected gamepad.')
         else:
             self._log.info('enabling ros arbitrator...')
-            _arbitrator = self._ros.get_arbitrator()
-            _arbitrator.set_suppressed(False)
+            self._get_arbitrator().set_suppressed(False)
         self._set_status_led(True)
 
     # ..........................................................................
     def _disable_ros(self):
-        self._log.info('ros state disabled at: {}'.format(self._get_timestamp()))
+        self._log.info('ros state disabled at: %s', _TIMESTAMP)
         if self._ros is not None:
             self._log.info('suppressing ros arbitrator... ')
-            _arbitrator = self._ros.get_arbitrator()
-            _arbitrator.set_suppressed(True)
+            self._get_arbitrator().set_suppressed(True)
             self._log.info('ros arbitrator suppressed.')
         self._set_status_led(False)
         # TODO make it flash instead
@@ -164,21 +215,25 @@ class RosDaemon():
     def _enable_gamepad(self):
         if self._gamepad is None:
             self._log.info('instantiating gamepad...')
+            from lib.gamepad_demo import GamepadDemo
             self._gamepad = GamepadDemo(Level.INFO)
         self._gamepad.enable()
         self._set_status_led(True)
-        self._log.info('gamepad enabled at: {}'.format(self._get_timestamp()))
+        self._log.info('gamepad enabled at: %s', _TIMESTAMP)
 
     # ..........................................................................
     def _disable_gamepad(self):
         if self._gamepad is not None:
             self._gamepad.disable()
         self._set_status_led(False)
-        self._log.info('gamepad disabled at: {}'.format(self._get_timestamp()))
+        self._log.info('gamepad disabled at: %s', _TIMESTAMP)
 
     # ..........................................................................
     def close(self):
         self._log.info('closing rosd...')
+        self._heartbeat_stop.set()
+        self._heartbeat_thread.join(timeout=self._thread_timeout_delay_sec)
+        self._gpio.remove_event_detect(self._switch_pin)
         if self._ros is not None:
             self._log.info('closing ros...')
             self._ros.close()
@@ -199,12 +254,14 @@ def main():
         filename = 'config.yaml'
         _config = _loader.configure(filename)
         _daemon = RosDaemon(_config, GPIO, Level.INFO)
+        _daemon.read_state() # the switch may already be on
         while True:
+            _daemon.wait_for_edge()
             _daemon.read_state()
-            time.sleep(2.0)
 
     except Exception:
-        print('error starting ros daemon: {}'.format(traceback.format_exc()))
+        print('error starting ros daemon:', file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
     finally:
         if _daemon is not None:
             try:
@@ -215,13 +272,32 @@ def main():
 
 # ..............................................................................
 
+def break_stale_pidfile(lock):
+    '''
+        Breaks the pid file lock if the process it names is no longer
+        running (e.g., following an unclean exit), as otherwise acquiring
+        the lock would wait upon a process that will never release it.
+    '''
+    _pid = lock.read_pid()
+    if _pid is not None:
+        try:
+            os.kill(_pid, 0)
+        except ProcessLookupError:
+            print('breaking stale pid file of process {:d}.'.format(_pid))
+            lock.break_lock()
+        except PermissionError:
+            pass # the pid is alive but owned by another user, so left as is
+
+_pidfile = pidfile.TimeoutPIDLockFile(PIDFILE, acquire_timeout=2)
+break_stale_pidfile(_pidfile)
+
 with daemon.DaemonContext(
     stdout=sys.stdout,
     stderr=sys.stderr,
 #   chroot_directory=None,
     working_directory='/home/pi/ros',
     umask=0o002,
-    pidfile=pidfile.TimeoutPIDLockFile(PIDFILE), ) as context:
+    pidfile=_pidfile, ) as context:
 #   signal_map={
 #       signal.SIGTERM: shutdown,
 #       signal.SIGTSTP: shutdown